@@ -134,10 +134,12 @@ class CashBacktest:
 
         self._pnl = _pnl                                                            # individual signals P&L
 
-        # TODO FIX very slow - hence only calculate on demand
-        _pnl_trades = None
-        # _pnl_trades = tsc.calculate_individual_trade_gains(signal_df, _pnl)
-        self._pnl_trades = _pnl_trades
+        # trades are found for all signals at once (vectorised), so quick enough to calculate on every backtest, and
+        # then used for both the P&L of each trade (on its exit date) and the table of every trade
+        trade_points = tsc.calculate_trade_points(signal_df, _pnl)
+
+        self._pnl_trades = tsc.calculate_individual_trade_gains(signal_df, _pnl, trade_points = trade_points)
+        self._trades = tsc.calculate_trades(signal_df, _pnl, trade_points = trade_points)
 
         self._tsd_pnl = TimeSeriesDesc()
         self._tsd_pnl.calculate_ret_stats(self._pnl, br.ann_factor)
@@ -300,12 +302,20 @@ class CashBacktest:
         pandas.Dataframe
         """
 
-        if self._pnl_trades is None:
-            tsc = TimeSeriesCalcs()
-            self._pnl_trades = tsc.calculate_individual_trade_gains(self._signal, self._pnl)
-
         return self._pnl_trades
 
+    def get_trades(self):
+        """
+        get_trades - Gets table of every individual trade per signal (with entry/exit dates, periods held, position
+        and return), excluding periods when the position is flat
+
+        Returns
+        -------
+        pandas.Dataframe
+        """
+
+        return self._trades
+
     def get_pnl_desc(self):
         """
         get_pnl_desc - Gets P&L return statistics in a string format
@@ -15,7 +15,7 @@ __author__ = 'saeedamen'
 """
 MarketLiquidity
 
-Calculates spread between bid/ask and also tick count.
+Calculates spread between bid/ask and also tick count (from DataFrames or CompactTicks).
 
 """
 
@@ -24,6 +24,7 @@ import pandas
 from pythalesians.util.configmanager import ConfigManager
 from pythalesians.util.loggermanager import LoggerManager
 from pythalesians.market.loaders.assets.fxcrossfactory import FXCrossFactory
+from pythalesians.timeseries.calcs.compactticks import CompactTicks
 
 class MarketLiquidity:
 
@@ -36,6 +37,10 @@ class MarketLiquidity:
 
         cols = [x + '.spread' for x in asset]
 
+        # compact ticks are for a single asset, and spreads can be taken straight from the integer prices
+        if isinstance(data_frame, CompactTicks):
+            return pandas.DataFrame({cols[0] : data_frame.get_spread()}, index = data_frame.get_index())
+
         data_frame_spreads = pandas.DataFrame(index=data_frame.index, columns=cols)
 
         for a in asset:
@@ -46,6 +51,9 @@ class MarketLiquidity:
     def calculate_tick_count(self, data_frame, asset, freq = '1h'):
         if isinstance(asset, str): asset = [asset]
 
+        if isinstance(data_frame, CompactTicks):
+            return pandas.DataFrame({asset[0] + '.event' : data_frame.get_tick_count(freq)})
+
         data_frame_tick_count = data_frame.resample(freq, how='count').dropna()
         data_frame_tick_count = data_frame_tick_count[[0]]
 
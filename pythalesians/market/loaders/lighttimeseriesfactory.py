@@ -21,6 +21,13 @@ Provides a common wrapper for all these data sources.
 """
 
 import copy
+import collections
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas
 
 from pythalesians.util.configmanager import ConfigManager
 from pythalesians.util.loggermanager import LoggerManager
@@ -29,9 +36,26 @@ from pythalesians.timeseries.calcs.timeseriescalcs import TimeSeriesCalcs
 from pythalesians.market.requests.timeseriesrequest import TimeSeriesRequest
 from pythalesians.timeseries.calcs.timeseriesfilter import TimeSeriesFilter
 from pythalesians.market.loaders.timeseriesio import TimeSeriesIO
+from pythalesians.market.loaders.timeseriescache import TimeSeriesCache
+from pythalesians.market.loaders.tickerbatchplanner import TickerBatchPlanner
 
 class LightTimeSeriesFactory:
-    _time_series_cache = {} # shared across all instances of object!
+    # memory budget for cached time series, beyond which they are evicted (LRU), and optionally spilled to disk
+    # (call set_cache to change these)
+    _time_series_cache = TimeSeriesCache(max_bytes = 1024 * 1024 * 1024) # shared across all instances of object!
+
+    # thread pools for downloading, one per data source (data source => (thread no, executor)), kept open between calls
+    _executors = {}
+    _executor_users = {}            # executor => number of downloads using it
+    _retired_executors = set()      # replaced executors, which are shut down once their last user releases them
+    _executor_lock = threading.Lock()
+
+    # intraday/tick requests longer than this are split into date windows, which are downloaded in parallel (data source
+    # => window, call set_intraday_window to change these)
+    _intraday_windows = {'bloomberg' : datetime.timedelta(days = 30)}
+
+    # splits the tickers of daily requests into batches, using the latencies of previous requests to each data source
+    _batch_planner = TickerBatchPlanner() # shared across all instances of object!
 
     def __init__(self):
         # self.config = ConfigManager()
@@ -57,12 +81,70 @@ class LightTimeSeriesFactory:
 
         self._bbg_default_api = 'open-api'
 
-    def flush_cache(self):
+    def flush_cache(self, disk = False):
         """
         flush_cache - Flushs internal cache of time series
+
+        Parameters
+        ----------
+        disk : bool
+            also delete any time series which have been spilled to disk
+        """
+
+        self._time_series_cache.flush(disk = disk)
+
+    def set_cache(self, max_bytes = 1024 * 1024 * 1024, eviction = 'lru', disk_folder = None):
+        """
+        set_cache - Replaces the internal cache of time series (shared by all instances) with an empty one
+
+        Parameters
+        ----------
+        max_bytes : int
+            memory budget for cached time series (None for no limit)
+        eviction : str
+            'lru' (least recently used) or 'lfu' (least frequently used)
+        disk_folder : str (optional)
+            folder to spill evicted time series into, eg. Constants().temp_pythalesians_folder + "/tscache/"
+        """
+
+        LightTimeSeriesFactory._time_series_cache = TimeSeriesCache(max_bytes = max_bytes, eviction = eviction,
+                                                                    disk_folder = disk_folder)
+
+    def get_cache_stats(self):
+        """
+        get_cache_stats - Gets counts of hits, misses and evictions from the internal cache of time series
+
+        Returns
+        -------
+        dict
+        """
+
+        return self._time_series_cache.get_stats()
+
+    def set_batch_cap(self, data_source, cap):
+        """
+        set_batch_cap - Sets the maximum number of tickers in each daily request to a data source
+
+        Parameters
+        ----------
+        data_source : str
+            data source (eg. 'bloomberg', or 'other' for any data source without its own cap)
+        cap : int
+            maximum number of tickers per request
+        """
+
+        self._batch_planner.set_cap(data_source, cap)
+
+    def get_batch_stats(self, data_source):
+        """
+        get_batch_stats - Gets the latency statistics of daily requests to a data source (used to size batches)
+
+        Returns
+        -------
+        dict
         """
 
-        self._time_series_cache = {}
+        return self._batch_planner.get_stats(data_source)
 
     def set_intraday_code(self, code):
         self._intraday_code = code
@@ -196,9 +278,10 @@ class LightTimeSeriesFactory:
 
         fname = self.create_time_series_hash_key(time_series_request, ticker)
 
-        if (fname in self._time_series_cache):
-            data_frame = self._time_series_cache[fname]
+        # looks in memory first, then on disk (if evicted time series are being spilled)
+        data_frame = self._time_series_cache.get(fname)
 
+        if data_frame is not None:
             tsf = TimeSeriesFilter()
 
             return tsf.filter_time_series(time_series_request, data_frame)
@@ -243,65 +326,145 @@ class LightTimeSeriesFactory:
 
         ticker_cycle = 0
 
-        data_frame_group = []
+        time_series_request_list = []
+        ticker_windows = []
+
+        # create a list of TimeSeriesRequests, one per ticker, split into date windows if the request is long
+        for ticker in time_series_request.tickers:
+            time_series_request_single = copy.copy(time_series_request)
+            time_series_request_single.tickers = ticker
+
+            if hasattr(time_series_request, 'vendor_tickers'):
+                time_series_request_single.vendor_tickers = [time_series_request.vendor_tickers[ticker_cycle]]
+                ticker_cycle = ticker_cycle + 1
+
+            windows = self.split_date_windows(time_series_request_single)
+
+            ticker_windows.append(range(len(time_series_request_list), len(time_series_request_list) + len(windows)))
+            time_series_request_list.extend(windows)
+
+        data_frame_windows = [None] * len(time_series_request_list)
 
         # single threaded version
         # handle intraday ticker calls separately one by one
-        if len(time_series_request.tickers) == 1 or Constants().time_series_factory_thread_no['other'] == 1:
-            for ticker in time_series_request.tickers:
-                time_series_request_single = copy.copy(time_series_request)
-                time_series_request_single.tickers = ticker
+        if len(time_series_request_list) == 1 or self.get_thread_no(time_series_request.data_source) == 1:
+            for i in range(0, len(time_series_request_list)):
+                data_frame_windows[i] = self.fetch_single_time_series(time_series_request_list[i])
+        else:
+            # at most the number of threads for the data source are downloading at any time
+            for i, data_frame_single in self.iter_group_time_series(time_series_request_list):
+                data_frame_windows[i] = data_frame_single
 
-                if hasattr(time_series_request, 'vendor_tickers'):
-                    time_series_request_single.vendor_tickers = [time_series_request.vendor_tickers[ticker_cycle]]
-                    ticker_cycle = ticker_cycle + 1
+        # stitch the windows of each ticker together in date order
+        data_frame_group = [self.stitch_date_windows([data_frame_windows[i] for i in windows])
+                            for windows in ticker_windows]
 
-                # we downscale into float32, to avoid memory problems in Python (32 bit)
-                # data is stored on disk as float32 anyway
-                data_frame_single = loader.load_ticker(time_series_request_single)
+        # if the vendor doesn't provide any data, don't attempt to join
+        data_frame_group = [x for x in data_frame_group if x is not None]
 
-                # if the vendor doesn't provide any data, don't attempt to append
-                if data_frame_single is not None:
-                    if data_frame_single.empty == False:
-                        data_frame_single.index.name = 'Date'
-                        data_frame_single = data_frame_single.astype('float32')
+        # if you call for returning multiple tickers, be careful with memory considerations!
+        if len(data_frame_group) > 0:
+            data_frame_agg = time_series_calcs.outer_join(data_frame_group)
 
-                        data_frame_group.append(data_frame_single)
+        return data_frame_agg
 
-                        # # if you call for returning multiple tickers, be careful with memory considerations!
-                        # if data_frame_agg is not None:
-                        #     data_frame_agg = data_frame_agg.join(data_frame_single, how='outer')
-                        # else:
-                        #     data_frame_agg = data_frame_single
+    def set_intraday_window(self, data_source, window):
+        """
+        set_intraday_window - Sets the length of the date windows which long intraday/tick requests are split into
+        (shared across all instances)
 
-                # key = self.create_category_key(time_series_request, ticker)
-                # fname = self.create_cache_file_name(key)
-                # self._time_series_cache[fname] = data_frame_agg  # cache in memory (disable for intraday)
+        Parameters
+        ----------
+        data_source : str
+            data source (eg. 'bloomberg')
+        window : datetime.timedelta
+            length of each window (None to never split requests)
+        """
 
+        LightTimeSeriesFactory._intraday_windows[data_source] = window
 
-            # if you call for returning multiple tickers, be careful with memory considerations!
-            if data_frame_group is not None:
-                data_frame_agg = time_series_calcs.pandas_outer_join(data_frame_group)
+    def split_date_windows(self, time_series_request):
+        """
+        split_date_windows - Splits a request into consecutive date windows (each a copy of the request), if it is
+        longer than the window for its data source
 
-            return data_frame_agg
-        else:
-            time_series_request_list = []
+        Parameters
+        ----------
+        time_series_request : TimeSeriesRequest
+            request for a single ticker
+
+        Returns
+        -------
+        list(TimeSeriesRequest)
+        """
+
+        window = LightTimeSeriesFactory._intraday_windows.get(time_series_request.data_source)
+
+        start_date = time_series_request.start_date
+        finish_date = time_series_request.finish_date
+
+        if window is None: return [time_series_request]
 
-            # create a list of TimeSeriesRequests
-            for ticker in time_series_request.tickers:
-                time_series_request_single = copy.copy(time_series_request)
-                time_series_request_single.tickers = ticker
+        # bars made from ticks need all the ticks in the bar, so can't be cut at window boundaries
+        if hasattr(time_series_request, 'bar_freq'): return [time_series_request]
 
-                if hasattr(time_series_request, 'vendor_tickers'):
-                    time_series_request_single.vendor_tickers = [time_series_request.vendor_tickers[ticker_cycle]]
-                    ticker_cycle = ticker_cycle + 1
+        if not(isinstance(start_date, datetime.datetime)) or not(isinstance(finish_date, datetime.datetime)):
+            return [time_series_request]
 
-                time_series_request_list.append(time_series_request_single)
+        if finish_date - start_date <= window: return [time_series_request]
 
-            return self.fetch_group_time_series(time_series_request_list)
+        windows = []
+
+        while start_date < finish_date:
+            time_series_request_window = copy.copy(time_series_request)
+            time_series_request_window.start_date = start_date
+            time_series_request_window.finish_date = min(start_date + window, finish_date)
+
+            windows.append(time_series_request_window)
+
+            start_date = time_series_request_window.finish_date
+
+        return windows
+
+    def stitch_date_windows(self, data_frame_list):
+        """
+        stitch_date_windows - Joins the time series downloaded for consecutive date windows of the same ticker, dropping
+        any points repeated at the start of a window (windows share their boundaries)
+
+        Parameters
+        ----------
+        data_frame_list : list(pandas.DataFrame)
+            time series for each window, in date order
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        data_frame_list = [x for x in data_frame_list if x is not None]
+        data_frame_list = [x for x in data_frame_list if not(x.empty)]
+
+        if len(data_frame_list) == 0: return None
+        if len(data_frame_list) == 1: return data_frame_list[0]
+
+        last_date = data_frame_list[0].index[-1]
+
+        for i in range(1, len(data_frame_list)):
+            data_frame = data_frame_list[i]
+
+            # everything up to the end of the previous window has already been downloaded
+            # (searchsorted, so several ticks at the same time at the boundary are kept together)
+            start = data_frame.index.searchsorted(last_date, side = 'right')
+
+            if start > 0: data_frame_list[i] = data_frame.iloc[start:]
+
+            if len(data_frame_list[i].index) > 0: last_date = data_frame_list[i].index[-1]
+
+        return pandas.concat(data_frame_list)
 
     def fetch_single_time_series(self, time_series_request):
-        data_frame_single = self.get_loader(time_series_request.data_source).load_ticker(time_series_request)
+        data_frame_single = self.load_ticker_timed(self.get_loader(time_series_request.data_source),
+                                                   time_series_request)
 
         if data_frame_single is not None:
             if data_frame_single.empty == False:
@@ -317,78 +480,220 @@ class LightTimeSeriesFactory:
 
         return data_frame_single
 
+    def load_ticker_timed(self, loader, time_series_request):
+        start = time.time()
+
+        data_frame = loader.load_ticker(time_series_request)
+
+        # only daily requests have batches of tickers to plan
+        if time_series_request.freq not in ['intraday', 'tick', 'second', 'hour', 'minute']:
+            self._batch_planner.record(time_series_request.data_source, len(time_series_request.tickers),
+                                       time.time() - start)
+
+        return data_frame
+
     def fetch_group_time_series(self, time_series_request_list):
+        """
+        fetch_group_time_series - Downloads several time series in parallel and joins them together
+
+        Parameters
+        ----------
+        time_series_request_list : list(TimeSeriesRequest)
+            requests to download (all for the same data source)
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
 
         data_frame_agg = None
 
         time_series_calcs = TimeSeriesCalcs()
 
+        # keep the results in the order of the requests (so columns are in the same order), whatever order they finish
+        data_frame_group = [None] * len(time_series_request_list)
+
+        for i, data_frame_single in self.iter_group_time_series(time_series_request_list):
+            data_frame_group[i] = data_frame_single
+
+        # collect together all the time series, with one k-way join once they have all arrived: joining each one into
+        # the aggregate as it arrives would copy the (growing) aggregate every time, and all the downloads have to
+        # finish before we can return anyway, so nothing would be gained
+        data_frame_group = [i for i in data_frame_group if i is not None]
+
+        if len(data_frame_group) > 0:
+            data_frame_agg = time_series_calcs.outer_join(data_frame_group)
+
+        return data_frame_agg
+
+    def iter_group_time_series(self, time_series_request_list):
+        """
+        iter_group_time_series - Downloads several time series in parallel, yielding each one as soon as it is ready
+        (if the generator is closed early, eg. after an exception, the downloads which haven't started are cancelled)
+
+        Parameters
+        ----------
+        time_series_request_list : list(TimeSeriesRequest)
+            requests to download (all for the same data source)
+
+        Returns
+        -------
+        generator of (int, pandas.DataFrame) - position in time_series_request_list and time series
+        """
+
+        if len(time_series_request_list) == 0: return
+
         # depends on the nature of operation as to whether we should use threading or multiprocessing library
-        if Constants().time_series_factory_thread_technique is "thread":
-            from multiprocessing.dummy import Pool
-        else:
-            # most of the time is spend waiting for Bloomberg to return, so can use threads rather than multiprocessing
-            # must use the multiprocessing_on_dill library otherwise can't pickle objects correctly
-            # note: currently not very stable
-            from multiprocessing_on_dill import Pool
+        if Constants().time_series_factory_thread_technique != "thread":
+            for i, data_frame_single in enumerate(self.fetch_group_time_series_multiprocessing(time_series_request_list)):
+                yield i, data_frame_single
 
-        thread_no = Constants().time_series_factory_thread_no['other']
+            return
+
+        executor = self.get_executor(time_series_request_list[0].data_source)
+        futures = {}
+
+        try:
+            for i in range(0, len(time_series_request_list)):
+                futures[executor.submit(self.fetch_single_time_series, time_series_request_list[i])] = i
+
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures: future.cancel()
+
+            self.release_executor(executor)
 
-        if time_series_request_list[0].data_source in Constants().time_series_factory_thread_no:
-            thread_no = Constants().time_series_factory_thread_no[time_series_request_list[0].data_source]
+    def fetch_group_time_series_multiprocessing(self, time_series_request_list):
+        # most of the time is spend waiting for Bloomberg to return, so can use threads rather than multiprocessing
+        # must use the multiprocessing_on_dill library otherwise can't pickle objects correctly
+        # note: currently not very stable
+        from multiprocessing_on_dill import Pool
 
-        pool = Pool(thread_no)
+        pool = Pool(self.get_thread_no(time_series_request_list[0].data_source))
 
-        # open the market data downloads in their own threads and return the results
+        # open the market data downloads in their own processes and return the results
         result = pool.map_async(self.fetch_single_time_series, time_series_request_list)
         data_frame_group = result.get()
 
         pool.close()
         pool.join()
 
-        # data_frame_group = results.get()
-        # data_frame_group = results
-        # data_frame_group = None
+        return data_frame_group
 
-        # import multiprocessing as multiprocessing
-        # close the pool and wait for the work to finish
+    def get_thread_no(self, data_source):
+        thread_no = Constants().time_series_factory_thread_no['other']
 
-        # processes = []
+        if data_source in Constants().time_series_factory_thread_no:
+            thread_no = Constants().time_series_factory_thread_no[data_source]
 
-        # for x in range(0, len(time_series_request_list)):
-        #    time_series_request = time_series_request_list[x]
-        # processes =   [multiprocessing.Process(target = self.fetch_single_time_series,
-        #                                           args = (x)) for x in time_series_request_list]
+        return thread_no
 
-        # pool.apply_async(tsf.harvest_category, args = (category_desc, environment, freq,
-        #             exclude_freq_cat, force_new_download_freq_cat, include_freq_cat))
+    def get_executor(self, data_source):
+        """
+        get_executor - Gets the thread pool for a data source, which is kept open between calls (and replaced if the
+        number of threads for the data source in Constants has changed). Every call must be matched by a call to
+        release_executor once the executor is no longer used.
 
-        # Run processes
-        # for p in processes: p.start()
+        Parameters
+        ----------
+        data_source : str
+            data source of the requests
 
-        # Exit the completed processes
-        # for p in processes: p.join()
+        Returns
+        -------
+        ThreadPoolExecutor
+        """
 
-        # collect together all the time series
-        if data_frame_group is not None:
-            data_frame_group = [i for i in data_frame_group if i is not None]
+        thread_no = self.get_thread_no(data_source)
+        retired = []
 
-            if data_frame_group is not None:
-                data_frame_agg = time_series_calcs.pandas_outer_join(data_frame_group)
+        with LightTimeSeriesFactory._executor_lock:
+            executor = None
 
-            # for data_frame_single in data_frame_group:
-            #     # if you call for returning multiple tickers, be careful with memory considerations!
-            #     if data_frame_single is not None:
-            #         if data_frame_agg is not None:
-            #             data_frame_agg = data_frame_agg.join(data_frame_single, how='outer')
-            #         else:
-            #             data_frame_agg = data_frame_single
+            if data_source in LightTimeSeriesFactory._executors:
+                executor_thread_no, executor = LightTimeSeriesFactory._executors[data_source]
 
-        return data_frame_agg
+                if executor_thread_no != thread_no:
+                    # other threads may still be submitting downloads to the old executor
+                    retired = self._retire_executor(executor)
+                    executor = None
+
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers = thread_no)
+
+                LightTimeSeriesFactory._executors[data_source] = (thread_no, executor)
+                LightTimeSeriesFactory._executor_users[executor] = 0
+
+            LightTimeSeriesFactory._executor_users[executor] = LightTimeSeriesFactory._executor_users[executor] + 1
+
+        self._shutdown_executors(retired, wait = False)
+
+        return executor
+
+    def release_executor(self, executor):
+        """
+        release_executor - Releases an executor from get_executor (shutting it down if it has been replaced, and
+        nothing else is using it)
+
+        Parameters
+        ----------
+        executor : ThreadPoolExecutor
+            executor from get_executor
+        """
+
+        retired = []
+
+        with LightTimeSeriesFactory._executor_lock:
+            LightTimeSeriesFactory._executor_users[executor] = LightTimeSeriesFactory._executor_users[executor] - 1
+
+            if executor in LightTimeSeriesFactory._retired_executors: retired = self._retire_executor(executor)
+
+        self._shutdown_executors(retired, wait = False)
+
+    def shutdown_executors(self, wait = True):
+        """
+        shutdown_executors - Closes the thread pools of all data sources (cancelling downloads which haven't started,
+        if wait is False); they are reopened if needed. Thread pools which are still being used are closed as soon as
+        they are released.
+        """
+
+        retired = []
+
+        with LightTimeSeriesFactory._executor_lock:
+            executors = LightTimeSeriesFactory._executors
+            LightTimeSeriesFactory._executors = {}
+
+            for data_source in executors:
+                retired = retired + self._retire_executor(executors[data_source][1])
+
+        self._shutdown_executors(retired, wait = wait)
+
+    def _retire_executor(self, executor):
+        # only called with the lock held, returns the executor if nothing is using it (so it can be shut down once the
+        # lock is released)
+        if LightTimeSeriesFactory._executor_users.get(executor, 0) > 0:
+            LightTimeSeriesFactory._retired_executors.add(executor)
+
+            return []
+
+        LightTimeSeriesFactory._retired_executors.discard(executor)
+        LightTimeSeriesFactory._executor_users.pop(executor, None)
+
+        return [executor]
+
+    def _shutdown_executors(self, executors, wait):
+        for executor in executors:
+            try:
+                executor.shutdown(wait = wait, cancel_futures = not(wait))
+            except TypeError:
+                # older Pythons can't cancel queued futures on shutdown
+                executor.shutdown(wait = wait)
 
     def download_daily(self, time_series_request, loader):
         """
-        download_daily - Loads daily time series from specified data provider
+        download_daily - Loads daily time series from specified data provider (if the cache algo allows, only dates
+        which aren't already in the cache are downloaded, and spliced into the cached time series)
 
         Parameters
         ----------
@@ -401,35 +706,215 @@ class LightTimeSeriesFactory:
         """
 
         # daily data does not include ticker in the key, as multiple tickers in the same file
+        key = self.create_category_key(time_series_request)
+        fname = self.create_cache_file_name(key)
 
-        if Constants().time_series_factory_thread_no['other'] == 1:
-            data_frame_agg = loader.load_ticker(time_series_request)
-        else:
-            time_series_request_list = []
+        # events aren't indexed by date, so can't be spliced together
+        if hasattr(time_series_request, 'category'):
+            if 'events' in time_series_request.category:
+                data_frame_agg = self.download_daily_vendor(time_series_request, loader)
 
-            group_size = int(len(time_series_request.tickers) / Constants().time_series_factory_thread_no['other'] - 1)
+                self._time_series_cache.put(fname, data_frame_agg)
 
-            if group_size == 0: group_size = 1
+                return data_frame_agg
 
-            # split up tickers into groups related to number of threads to call
-            for i in range(0, len(time_series_request.tickers), group_size):
-                time_series_request_single = copy.copy(time_series_request)
-                time_series_request_single.tickers = time_series_request.tickers[i:i + group_size]
+        data_frame_cached = self._time_series_cache.get(fname)
+        coverage = {}
 
-                if hasattr(time_series_request, 'vendor_tickers'):
-                    time_series_request_single.vendor_tickers = \
-                        time_series_request.vendor_tickers[i:i + group_size]
+        if data_frame_cached is not None: coverage = self._time_series_cache.get_coverage(fname)
 
-                time_series_request_list.append(time_series_request_single)
+        start_date = pandas.Timestamp(time_series_request.start_date)
+        finish_date = pandas.Timestamp(time_series_request.finish_date)
 
-            data_frame_agg = self.fetch_group_time_series(time_series_request_list)
+        fields = time_series_request.fields
 
-        key = self.create_category_key(time_series_request)
-        fname = self.create_cache_file_name(key)
-        self._time_series_cache[fname] = data_frame_agg  # cache in memory (ok for daily data)
+        if isinstance(fields, str): fields = [fields]
+
+        # work out which dates we need to download for each ticker (internet_load always downloads everything)
+        intervals = collections.OrderedDict()
+
+        for i in range(0, len(time_series_request.tickers)):
+            ticker = time_series_request.tickers[i]
+
+            # coverage is kept for each ticker.field, as different requests can ask for different fields
+            ticker_fields = [ticker + '.' + field for field in fields]
+
+            if 'cache_algo' in time_series_request.cache_algo:
+                missing = self.get_missing_intervals(start_date, finish_date,
+                                                     self.get_common_coverage(coverage, ticker_fields))
+            else:
+                missing = [(start_date, finish_date)]
+
+                # data from a separate period would leave a gap, so replace it rather than splice it
+                for ticker_field in ticker_fields:
+                    if ticker_field in coverage and \
+                            not self.is_overlapping((start_date, finish_date), coverage[ticker_field]):
+                        if data_frame_cached is not None and ticker_field in data_frame_cached.columns:
+                            data_frame_cached = data_frame_cached.drop([ticker_field], axis = 1)
+
+                        del coverage[ticker_field]
+
+            for interval in missing:
+                if interval not in intervals: intervals[interval] = []
+
+                intervals[interval].append(i)
+
+        if len(intervals) == 0:
+            self.logger.debug("All dates in cache for " + key)
+
+            return data_frame_cached
+
+        # make one request for each distinct interval (for all the tickers missing it)
+        data_frame_list = []
+
+        for interval in intervals:
+            time_series_request_interval = copy.copy(time_series_request)
+            time_series_request_interval.start_date = interval[0].to_pydatetime()
+            time_series_request_interval.finish_date = interval[1].to_pydatetime()
+            time_series_request_interval.tickers = [time_series_request.tickers[i] for i in intervals[interval]]
+
+            if hasattr(time_series_request, 'vendor_tickers'):
+                time_series_request_interval.vendor_tickers = \
+                    [time_series_request.vendor_tickers[i] for i in intervals[interval]]
+
+            self.logger.debug("Downloading " + str(interval[0]) + " - " + str(interval[1]) + " for "
+                              + str(time_series_request_interval.tickers))
+
+            data_frame_interval = self.download_daily_vendor(time_series_request_interval, loader)
+
+            # don't mark these dates as covered if the download failed
+            if data_frame_interval is None: continue
+
+            data_frame_list.append(data_frame_interval)
+
+            for ticker in time_series_request_interval.tickers:
+                for field in fields:
+                    ticker_field = ticker + '.' + field
+
+                    if ticker_field in coverage:
+                        coverage[ticker_field] = (min(coverage[ticker_field][0], interval[0]),
+                                                  max(coverage[ticker_field][1], interval[1]))
+                    else:
+                        coverage[ticker_field] = interval
+
+        # newly downloaded data takes precedence (eg. the last day in the cache may have been incomplete)
+        data_frame_agg = data_frame_cached
+
+        for data_frame_interval in data_frame_list:
+            if data_frame_agg is None:
+                data_frame_agg = data_frame_interval
+            else:
+                data_frame_agg = data_frame_interval.combine_first(data_frame_agg)
+
+        self._time_series_cache.put(fname, data_frame_agg, coverage = coverage)  # cache in memory (ok for daily data)
 
         return data_frame_agg
 
+    def download_daily_vendor(self, time_series_request, loader):
+        """
+        download_daily_vendor - Downloads daily time series from the data provider, in batches of tickers sized by
+        TickerBatchPlanner (in parallel if set in Constants)
+
+        Parameters
+        ----------
+        time_series_request : TimeSeriesRequest
+            contains various properties describing time series to fetched, including ticker, start & finish date etc.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        thread_no = self.get_thread_no(time_series_request.data_source)
+
+        # batch sizes depend on the cap for the data source and how long previous requests took
+        batches = self._batch_planner.plan(time_series_request.data_source, len(time_series_request.tickers),
+                                           thread_no)
+
+        if len(batches) <= 1:
+            return self.load_ticker_timed(loader, time_series_request)
+
+        time_series_request_list = []
+
+        for start, finish in batches:
+            time_series_request_single = copy.copy(time_series_request)
+            time_series_request_single.tickers = time_series_request.tickers[start:finish]
+
+            if hasattr(time_series_request, 'vendor_tickers'):
+                time_series_request_single.vendor_tickers = time_series_request.vendor_tickers[start:finish]
+
+            time_series_request_list.append(time_series_request_single)
+
+        if thread_no == 1:
+            data_frame_group = [self.load_ticker_timed(loader, x) for x in time_series_request_list]
+            data_frame_group = [x for x in data_frame_group if x is not None]
+
+            if len(data_frame_group) == 0: return None
+
+            return TimeSeriesCalcs().outer_join(data_frame_group)
+
+        return self.fetch_group_time_series(time_series_request_list)
+
+    def get_missing_intervals(self, start_date, finish_date, coverage):
+        """
+        get_missing_intervals - Works out which dates need to be downloaded, given the dates already in the cache
+        (any gap between the request and the cached dates is included, so the result stays contiguous)
+
+        Parameters
+        ----------
+        start_date : Timestamp
+            start date of request
+        finish_date : Timestamp
+            finish date of request
+        coverage : tuple(Timestamp) (optional)
+            start and finish date already in the cache
+
+        Returns
+        -------
+        list(tuple(Timestamp))
+        """
+
+        if coverage is None: return [(start_date, finish_date)]
+
+        missing = []
+
+        # head and tail overlap the cached dates by one point (which the new download overwrites)
+        if start_date < coverage[0]: missing.append((start_date, coverage[0]))
+        if finish_date > coverage[1]: missing.append((coverage[1], finish_date))
+
+        return missing
+
+    def get_common_coverage(self, coverage, ticker_fields):
+        """
+        get_common_coverage - Gets the dates which are in the cache for all of the ticker.field combinations
+
+        Parameters
+        ----------
+        coverage : dict
+            ticker.field => (start date, finish date) already in the cache
+        ticker_fields : list(str)
+            ticker.field combinations requested
+
+        Returns
+        -------
+        tuple(Timestamp) (None if any of them aren't in the cache)
+        """
+
+        if len(ticker_fields) == 0: return None
+
+        for ticker_field in ticker_fields:
+            if ticker_field not in coverage: return None
+
+        start_date = max([coverage[x][0] for x in ticker_fields])
+        finish_date = min([coverage[x][1] for x in ticker_fields])
+
+        if start_date > finish_date: return None
+
+        return (start_date, finish_date)
+
+    def is_overlapping(self, interval_1, interval_2):
+        return interval_1[0] <= interval_2[1] and interval_2[0] <= interval_1[1]
+
     def create_category_key(self, time_series_request, ticker=None):
         """
         create_category_key - Returns a category key for the associated TimeSeriesRequest
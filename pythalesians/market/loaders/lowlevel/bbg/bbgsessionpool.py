@@ -0,0 +1,272 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+BBGSessionPool
+
+Keeps a pool of started Bloomberg Open API sessions (with //blp/refdata already opened), so that requests don't have
+to pay for starting a session every time. Each session is handed out to one request at a time (responses are read
+with nextEvent, which returns events for every request on the session). Sessions are health checked before being
+handed out, and dropped if they have been terminated, were left in a bad state by a failed request, or have been idle
+for too long.
+
+The blpapi module can be passed in, eg. a fake one for testing without a Bloomberg connection.
+
+"""
+
+import threading
+import time
+
+from pythalesians.util.loggermanager import LoggerManager
+
+class BBGSessionPool:
+
+    def __init__(self, server_host, server_port, max_size = 8, max_idle = 300, start_tries = 5,
+                 service = "//blp/refdata", api = None, acquire_timeout = 600):
+        """
+        __init__ - Creates an empty pool (sessions are started when first needed)
+
+        Parameters
+        ----------
+        server_host : str
+            Bloomberg server address
+        server_port : int
+            Bloomberg server port
+        max_size : int
+            maximum number of sessions (requests wait for a session beyond this)
+        max_idle : float
+            seconds after which an idle session is stopped rather than reused
+        start_tries : int
+            number of attempts to start a session and open the service
+        service : str
+            Bloomberg service to open on each session
+        api : module (optional)
+            blpapi module (or a fake with the same interface)
+        acquire_timeout : float
+            default seconds to wait for a free session in acquire
+        """
+        self.logger = LoggerManager().getLogger(__name__)
+
+        if api is None:
+            import blpapi as api
+
+        self.api = api
+
+        self.server_host = server_host
+        self.server_port = server_port
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.start_tries = start_tries
+        self.service = service
+        self.acquire_timeout = acquire_timeout
+
+        self.SESSION_TERMINATED = api.Name("SessionTerminated")
+        self.SESSION_CONNECTION_DOWN = api.Name("SessionConnectionDown")
+
+        self._idle = [] # list of (session, time released)
+        self._size = 0  # sessions handed out or idle
+        self._condition = threading.Condition()
+
+        self._stats = {'created' : 0, 'reused' : 0, 'discarded' : 0}
+
+    def acquire(self, timeout = None):
+        """
+        acquire - Gets a session with the service opened, reusing an idle one if possible (waits if max_size sessions
+        are already in use, and raises an exception if none is freed in time)
+
+        Parameters
+        ----------
+        timeout : float (optional)
+            seconds to wait for a free session (default acquire_timeout)
+
+        Returns
+        -------
+        blpapi.Session (None if we couldn't start one)
+        """
+        if timeout is None: timeout = self.acquire_timeout
+
+        deadline = time.time() + timeout
+
+        unhealthy = []
+
+        try:
+            with self._condition:
+                while True:
+                    # most recently used first, as it is the most likely to still be alive
+                    while len(self._idle) > 0:
+                        idle_session, released = self._idle.pop()
+
+                        if self.is_healthy(idle_session, released):
+                            self._stats['reused'] = self._stats['reused'] + 1
+
+                            return idle_session
+
+                        self._discard(idle_session)
+                        unhealthy.append(idle_session)
+
+                    if self._size < self.max_size:
+                        self._size = self._size + 1
+
+                        break
+
+                    wait = deadline - time.time()
+
+                    if wait <= 0:
+                        raise Exception("Timed out after " + str(timeout) + "s waiting for a Bloomberg session (all "
+                                        + str(self.max_size) + " sessions in use)")
+
+                    self._condition.wait(wait)
+        finally:
+            # stopping sessions can be slow, so don't hold up other threads
+            self._stop_sessions(unhealthy)
+
+        # start the new session outside the lock (slow)
+        session = self._create_session()
+
+        with self._condition:
+            if session is None:
+                self._size = self._size - 1
+                self._condition.notify()
+            else:
+                self._stats['created'] = self._stats['created'] + 1
+
+        return session
+
+    def release(self, session, healthy = True):
+        """
+        release - Gives a session back to the pool
+
+        Parameters
+        ----------
+        session : blpapi.Session
+            session from acquire
+        healthy : bool
+            False if the request failed part way (eg. there may be unread events), in which case it is stopped
+        """
+        if session is None: return
+
+        with self._condition:
+            if healthy:
+                self._idle.append((session, time.time()))
+            else:
+                self._discard(session)
+
+            self._condition.notify()
+
+        if not(healthy): self._stop_sessions([session])
+
+    def close(self):
+        """
+        close - Stops all the idle sessions (sessions in use are stopped when they are released unhealthy, or when the
+        pool is used again after they become idle for too long)
+        """
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+
+            for session, released in idle:
+                self._discard(session)
+
+            self._condition.notify_all()
+
+        self._stop_sessions([session for session, released in idle])
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+
+        return stats
+
+    def is_healthy(self, session, released):
+        """
+        is_healthy - Checks whether an idle session can still be used (hasn't been idle for too long, the service is
+        still open and the session hasn't sent any termination/connection down events since it was released)
+
+        Parameters
+        ----------
+        session : blpapi.Session
+            session to check
+        released : float
+            time when the session was released
+
+        Returns
+        -------
+        bool
+        """
+        if self.max_idle is not None and time.time() - released > self.max_idle: return False
+
+        try:
+            session.getService(self.service)
+
+            # any events now are status messages (the last request read all its responses)
+            event = session.tryNextEvent()
+
+            while event is not None:
+                for msg in event:
+                    if msg.messageType() in [self.SESSION_TERMINATED, self.SESSION_CONNECTION_DOWN]: return False
+
+                event = session.tryNextEvent()
+        except:
+            return False
+
+        return True
+
+    def _discard(self, session):
+        # only called with the lock held, the session must be stopped (with _stop_sessions) after releasing the lock
+        self._size = self._size - 1
+        self._stats['discarded'] = self._stats['discarded'] + 1
+
+    def _stop_sessions(self, sessions):
+        for session in sessions:
+            try:
+                session.stop()
+            except: pass
+
+    def _create_session(self):
+        for tries in range(0, self.start_tries):
+            session = None
+
+            try:
+                session_options = self.api.SessionOptions()
+                session_options.setServerHost(self.server_host)
+                session_options.setServerPort(self.server_port)
+
+                self.logger.info("Starting Bloomberg session...")
+
+                session = self.api.Session(session_options)
+
+                if session.start():
+                    if session.openService(self.service): return session
+
+                    self.logger.info("Failed to open " + self.service + "... try " + str(tries))
+                else:
+                    self.logger.info("Failed to start Bloomberg session... try " + str(tries))
+            except:
+                self.logger.info("Error starting Bloomberg session... try " + str(tries))
+
+            # stop the half started session before trying again
+            if session is not None:
+                try:
+                    session.stop()
+                except: pass
+
+        self.logger.error("Failed to start Bloomberg session with " + self.service)
+
+        return None
+
+if __name__ == '__main__':
+    # see pythalesians.market.loaders.lowlevel.bbg.loaderbbgopen, which uses BBGSessionPool
+    pass
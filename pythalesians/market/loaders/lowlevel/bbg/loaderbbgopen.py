@@ -24,7 +24,9 @@ import copy
 import collections
 import datetime
 import re
+import threading
 
+import numpy
 import pandas
 import blpapi   # Bloomberg Open API (adapted by Fil Mackay for Python 3.4 - https://github.com/filmackay/blpapi-py)
 
@@ -33,6 +35,8 @@ from pythalesians.util.constants import Constants
 from pythalesians.util.loggermanager import LoggerManager
 from pythalesians.market.loaders.lowlevel.bbg.optionsbbg import OptionsBBG
 from pythalesians.market.loaders.lowlevel.bbg.loaderbbg import LoaderBBG
+from pythalesians.market.loaders.lowlevel.bbg.bbgsessionpool import BBGSessionPool
+from pythalesians.timeseries.calcs.timeseriesbaraggregator import TimeSeriesBarAggregator
 
 from collections import defaultdict
 
@@ -90,20 +94,21 @@ class LoaderBBGOpen(LoaderBBG):
         return data_frame
 
     def kill_session(self):
-        # TODO not really needed, because we automatically kill sessions
-        BBGLowLevelDaily().kill_session(None)
-        BBGLowLevelRef().kill_session(None)
-        BBGLowLevelIntraday().kill_session(None)
+        # stops the idle sessions in the pool (new ones are started if needed)
+        BBGLowLevelTemplate.close_session_pool()
 
 ########################################################################################################################
 #### Lower level code to interact with Bloomberg Open API
 
 class BBGLowLevelTemplate:
 
-    _session = None
+    # pool of sessions (with //blp/refdata opened) shared across all instances of object!
+    _session_pool = None
+    _session_pool_lock = threading.Lock()
 
     def __init__(self):
         self._data_frame = None
+        self._session_terminated = False
 
         self.RESPONSE_ERROR = blpapi.Name("responseError")
         self.SESSION_TERMINATED = blpapi.Name("SessionTerminated")
@@ -116,40 +121,23 @@ class BBGLowLevelTemplate:
 
         options = self.fill_options(time_series_request)
 
-        #if(BBGLowLevelTemplate._session is None):
-        session = self.start_bloomberg_session()
-        #else:
-        #    session = BBGLowLevelTemplate._session
+        session_pool = self.get_session_pool()
+        session = session_pool.acquire()
 
-        try:
-            # if can't open the session, kill existing one
-            # then try reopen (up to 5 times...)
-            i = 0
-
-            while i < 5:
-                if session is not None:
-                    if not session.openService("//blp/refdata"):
-                        self.logger.info("Try reopening Bloomberg session... try " + str(i))
-                        self.kill_session(session) # need to forcibly kill_session since can't always reopen
-                        session = self.start_bloomberg_session()
-
-                        if session is not None:
-                            if session.openService("//blp/refdata"): i = 6
-                else:
-                    self.logger.info("Try opening Bloomberg session... try " + str(i))
-                    session = self.start_bloomberg_session()
-
-                i = i + 1
+        # give error if we couldn't start a session (the pool tries several times)
+        if session is None:
+            self.logger.error("Failed to open //blp/refdata")
 
-            # give error if still doesn't work after several tries..
-            if not session.openService("//blp/refdata"):
-                self.logger.error("Failed to open //blp/refdata")
+            return
 
-                return
+        healthy = False
 
+        try:
             self.logger.info("Creating request...")
             eventQueue = None # blpapi.EventQueue()
 
+            self._session_terminated = False
+
             # create a request
             self.send_bar_request(session, eventQueue)
             self.logger.info("Waiting for data to be returned...")
@@ -157,19 +145,47 @@ class BBGLowLevelTemplate:
             # wait for events from session and collect the data
             self.event_loop(session, eventQueue)
 
+            healthy = not(self._session_terminated)
         finally:
-            # stop the session (will fail if NoneType)
-            try:
-                session.stop()
-            except: pass
+            # if the request failed part way, there may be unread events, so don't reuse the session
+            session_pool.release(session, healthy = healthy)
 
         return self._data_frame
 
+    def get_session_pool(self):
+        """
+        get_session_pool - Gets the pool of Bloomberg sessions (creating it on first use, with as many sessions as
+        threads used for Bloomberg by LightTimeSeriesFactory)
+
+        Returns
+        -------
+        BBGSessionPool
+        """
+
+        with BBGLowLevelTemplate._session_pool_lock:
+            if BBGLowLevelTemplate._session_pool is None:
+                thread_no = Constants().time_series_factory_thread_no
+
+                max_size = thread_no['other']
+
+                if 'bloomberg' in thread_no: max_size = thread_no['bloomberg']
+
+                BBGLowLevelTemplate._session_pool = BBGSessionPool(Constants().bbg_server, Constants().bbg_server_port,
+                                                                   max_size = max_size, api = blpapi)
+
+            return BBGLowLevelTemplate._session_pool
+
+    @staticmethod
+    def close_session_pool():
+        with BBGLowLevelTemplate._session_pool_lock:
+            if BBGLowLevelTemplate._session_pool is not None:
+                BBGLowLevelTemplate._session_pool.close()
+
     def event_loop(self, session, eventQueue):
         not_done = True
 
-        data_frame = pandas.DataFrame()
-        data_frame_slice = None
+        # keep every slice and build the DataFrame once at the end (appending slice by slice is quadratic)
+        data_frame_slices = []
 
         while not_done:
             # nextEvent() method can be called with timeout to let
@@ -179,38 +195,27 @@ class BBGLowLevelTemplate:
             # Bloomberg will send us responses in chunks
             if event.eventType() == blpapi.Event.PARTIAL_RESPONSE:
                 # self.logger.info("Processing Bloomberg Partial Response")
-                data_frame_slice = self.process_response_event(event)
+                data_frame_slices.extend(self.process_response_event(event))
             elif event.eventType() == blpapi.Event.RESPONSE:
                 # self.logger.info("Processing Bloomberg Full Response")
-                data_frame_slice = self.process_response_event(event)
+                data_frame_slices.extend(self.process_response_event(event))
                 not_done = False
             else:
                 for msg in event:
                     if event.eventType() == blpapi.Event.SESSION_STATUS:
                         if msg.messageType() == self.SESSION_TERMINATED:
+                            self._session_terminated = True
                             not_done = False
 
-            # append DataFrame only if not empty
-            if data_frame_slice is not None:
-                if (data_frame.empty):
-                    data_frame = data_frame_slice
-                else:
-                    # make sure we do not reattach a message we've already read
-                    # sometimes Bloomberg can give us back the same message several times
-                    # CAREFUL with this!
-                    # compares the ticker names, and make sure they don't already exist in the time series
-                    data_frame = self.combine_slices(data_frame, data_frame_slice)
-
-        # make sure we do not have any duplicates in the time series
-        if data_frame is not None:
-            if data_frame.empty == False:
-                data_frame.drop_duplicates(keep='last')
-
-        self._data_frame = data_frame
+        if len(data_frame_slices) == 0:
+            self._data_frame = pandas.DataFrame()
+        else:
+            # also removes any duplicates (sometimes Bloomberg can give us back the same message several times)
+            self._data_frame = self.combine_slices(data_frame_slices)
 
     # process raw message returned by Bloomberg
     def process_response_event(self, event):
-        data_frame = pandas.DataFrame()
+        data_frame_slices = []
 
         for msg in event:
             # generates a lot of output - so don't use unless for debugging purposes
@@ -222,15 +227,10 @@ class BBGLowLevelTemplate:
 
             data_frame_slice = self.process_message(msg)
 
-            if (data_frame_slice is not None):
-                if (data_frame.empty):
-                    data_frame = data_frame_slice
-                else:
-                    data_frame = data_frame.append(data_frame_slice)
-            else:
-                data_frame = data_frame_slice
+            if data_frame_slice is not None:
+                data_frame_slices.append(data_frame_slice)
 
-        return data_frame
+        return data_frame_slices
 
     def get_previous_trading_date(self):
         tradedOn = datetime.date.today()
@@ -244,45 +244,6 @@ class BBGLowLevelTemplate:
             if tradedOn.weekday() not in [5, 6]:
                 return tradedOn
 
-    # create a session for Bloomberg with appropriate server & port
-    def start_bloomberg_session(self):
-        tries = 0
-
-        session = None
-
-        # try up to 5 times to start a session
-        while(tries < 5):
-            try:
-                # fill SessionOptions
-                sessionOptions = blpapi.SessionOptions()
-                sessionOptions.setServerHost(Constants().bbg_server)
-                sessionOptions.setServerPort(Constants().bbg_server_port)
-
-                self.logger.info("Starting Bloomberg session...")
-
-                # create a Session
-                session = blpapi.Session(sessionOptions)
-
-                # start a Session
-                if not session.start():
-                    self.logger.error("Failed to start session.")
-                    return
-
-                self.logger.info("Returning session...")
-
-                tries = 5
-            except:
-                tries = tries + 1
-
-        # BBGLowLevelTemplate._session = session
-
-        if session is None:
-            self.logger.error("Failed to start session.")
-            return
-
-
-        return session
-
     def add_override(self, request, field, value):
         overrides = request.getElement("overrides")
         override1 = overrides.appendElement()
@@ -300,12 +261,102 @@ class BBGLowLevelTemplate:
         # to be implemented by subclass
         return
 
-    # create request for data
+    # join all the slices returned by process_message into a DataFrame
     @abc.abstractmethod
-    def combine_slices(self, data_frame, data_frame_slice):
+    def combine_slices(self, data_frame_slices):
         # to be implemented by subclass
         return
 
+    def combine_ticker_slices(self, data_frame_slices):
+        # each slice is for one ticker, but Bloomberg can send the same ticker more than once, so only keep the first
+        tickers = pandas.Index([x.columns.get_level_values(1).values[0] for x in data_frame_slices])
+
+        data_frame_slices = [data_frame_slices[i] for i in numpy.flatnonzero(~tickers.duplicated())]
+
+        if len(data_frame_slices) == 1: return data_frame_slices[0]
+
+        # outer join on the dates in one go
+        return pandas.concat(data_frame_slices, axis = 1)
+
+    def decode_arrays(self, data, fields, integer_fields = None):
+        """
+        decode_arrays - Decodes an array of Bloomberg bars/ticks into a float32 matrix (one column per field), an int64
+        matrix for integer fields (eg. volumes, which float32 can't hold exactly) and datetime64 times, filling
+        preallocated buffers field by field
+
+        Parameters
+        ----------
+        data : blpapi.Element
+            array of bars/ticks (each with a time element)
+        fields : list(blpapi.Name)
+            fields to read from each bar/tick (read as floats)
+        integer_fields : list(blpapi.Name) (optional)
+            fields to read from each bar/tick as integers
+
+        Returns
+        -------
+        numpy.ndarray (times), numpy.ndarray (values), numpy.ndarray (integer values) - None if there are no values
+        """
+        if integer_fields is None: integer_fields = []
+
+        values_no = data.numValues()
+
+        if values_no == 0:
+            self.logger.info("No dates retrieved")
+            return None
+
+        data_vals = [data.getValue(i) for i in range(0, values_no)]
+
+        # order = 'F', so each field is contiguous, as we fill it
+        data_matrix = numpy.empty((values_no, len(fields)), dtype = numpy.float32, order = 'F')
+
+        for j, field in enumerate(fields):
+            data_matrix[:, j] = numpy.fromiter((x.getElementAsFloat(field) for x in data_vals),
+                                               dtype = numpy.float64, count = values_no)
+
+        integer_matrix = numpy.empty((values_no, len(integer_fields)), dtype = numpy.int64, order = 'F')
+
+        for j, field in enumerate(integer_fields):
+            integer_matrix[:, j] = numpy.fromiter((x.getElementAsInteger(field) for x in data_vals),
+                                                  dtype = numpy.int64, count = values_no)
+
+        # convert all the times in one go (Bloomberg times can have a time zone, so convert them to naive UTC)
+        time_array = pandas.to_datetime([x.getElementAsDatetime(self.TIME) for x in data_vals], utc = True)
+        time_array = numpy.asarray(time_array.tz_convert(None).values, dtype = 'datetime64[ns]')
+
+        self.logger.info("Dates between " + str(time_array[0]) + " - " + str(time_array[-1]))
+
+        return time_array, data_matrix, integer_matrix
+
+    def combine_array_slices(self, data_frame_slices, columns, integer_columns = None):
+        # each slice is (times, values, integer values) for a chunk of the same ticker, so join the arrays and create
+        # one DataFrame
+        if integer_columns is None: integer_columns = []
+
+        if len(data_frame_slices) == 1:
+            time_array, data_matrix, integer_matrix = data_frame_slices[0]
+        else:
+            time_array = numpy.concatenate([x[0] for x in data_frame_slices])
+
+            # keep each column contiguous (as pandas stores it), so the DataFrame doesn't need to copy it
+            data_matrix = numpy.empty((len(time_array), len(columns)), dtype = numpy.float32, order = 'F')
+            integer_matrix = numpy.empty((len(time_array), len(integer_columns)), dtype = numpy.int64, order = 'F')
+
+            start = 0
+
+            for x in data_frame_slices:
+                data_matrix[start:start + len(x[0])] = x[1]
+                integer_matrix[start:start + len(x[0])] = x[2]
+                start = start + len(x[0])
+
+        data_frame = pandas.DataFrame(data = data_matrix, index = pandas.DatetimeIndex(time_array), columns = columns,
+                                      copy = False)
+
+        for j, column in enumerate(integer_columns):
+            data_frame[column] = integer_matrix[:, j]
+
+        return data_frame
+
     def kill_session(self, session):
         if (session is not None):
             try:
@@ -325,13 +376,8 @@ class BBGLowLevelDaily(BBGLowLevelTemplate):
         self.logger = LoggerManager().getLogger(__name__)
         self._options = []
 
-    def combine_slices(self, data_frame, data_frame_slice):
-        if (data_frame_slice.columns.get_level_values(1).values[0]
-            not in data_frame.columns.get_level_values(1).values):
-
-            return data_frame.join(data_frame_slice, how="outer")
-
-        return data_frame
+    def combine_slices(self, data_frame_slices):
+        return self.combine_ticker_slices(data_frame_slices)
 
     # populate options for Bloomberg request for asset daily request
     def fill_options(self, time_series_request):
@@ -454,13 +500,8 @@ class BBGLowLevelRef(BBGLowLevelTemplate):
 
         return data_frame
 
-    def combine_slices(self, data_frame, data_frame_slice):
-        if (data_frame_slice.columns.get_level_values(1).values[0]
-            not in data_frame.columns.get_level_values(1).values):
-
-            return data_frame.join(data_frame_slice, how="outer")
-
-        return data_frame
+    def combine_slices(self, data_frame_slices):
+        return self.combine_ticker_slices(data_frame_slices)
 
     # create request for data
     def send_bar_request(self, session, eventQueue):
@@ -481,8 +522,6 @@ class BBGLowLevelRef(BBGLowLevelTemplate):
         self.logger.info("Sending Bloomberg Ref Request:" + str(request))
         session.sendRequest(request)
 
-from operator import itemgetter
-
 class BBGLowLevelIntraday(BBGLowLevelTemplate):
 
     def __init__(self):
@@ -501,8 +540,15 @@ class BBGLowLevelIntraday(BBGLowLevelTemplate):
         self.NUM_EVENTS = blpapi.Name("numEvents")
         self.TIME = blpapi.Name("time")
 
-    def combine_slices(self, data_frame, data_frame_slice):
-        return data_frame.append(data_frame_slice)
+    def combine_slices(self, data_frame_slices):
+        data_frame = self.combine_array_slices(data_frame_slices, ['open', 'high', 'low', 'close'],
+                                               integer_columns = ['volume', 'events'])
+
+        # there is only one bar for each time, so any repeated times are duplicated messages
+        if not data_frame.index.is_unique:
+            data_frame = data_frame[~data_frame.index.duplicated(keep = 'last')]
+
+        return data_frame
 
     # populate options for Bloomberg request for asset intraday request
     def fill_options(self, time_series_request):
@@ -523,71 +569,15 @@ class BBGLowLevelIntraday(BBGLowLevelTemplate):
 
         return self._options
 
-    # iterate through Bloomberg output creating a DataFrame output
+    # iterate through Bloomberg output creating arrays of the times and fields
     # implements abstract method
     def process_message(self, msg):
         data = msg.getElement(self.BAR_DATA).getElement(self.BAR_TICK_DATA)
 
         self.logger.info("Processing intraday data for " + str(self._options.security))
 
-        data_vals = list(data.values())
-
-        # data_matrix = numpy.zeros([len(data_vals), 6])
-        # data_matrix.fill(numpy.nan)
-        #
-        # date_index = [None] * len(data_vals)
-        #
-        # for i in range(0, len(data_vals)):
-        #     data_matrix[i][0] = data_vals[i].getElementAsFloat(self.OPEN)
-        #     data_matrix[i][1] = data_vals[i].getElementAsFloat(self.HIGH)
-        #     data_matrix[i][2] = data_vals[i].getElementAsFloat(self.LOW)
-        #     data_matrix[i][3] = data_vals[i].getElementAsFloat(self.CLOSE)
-        #     data_matrix[i][4] = data_vals[i].getElementAsInteger(self.VOLUME)
-        #     data_matrix[i][5] = data_vals[i].getElementAsInteger(self.NUM_EVENTS)
-        #
-        #     date_index[i] = data_vals[i].getElementAsDatetime(self.TIME)
-        #
-        # self.logger.info("Dates between " + str(date_index[0]) + " - " + str(date_index[-1]))
-        #
-        # # create pandas dataframe with the Bloomberg output
-        # return pandas.DataFrame(data = data_matrix, index = date_index,
-        #                columns=['open', 'high', 'low', 'close', 'volume', 'events'])
-
-        ## for loop method is touch slower
-        # time_list = []
-        # data_table = []
-
-        # for bar in data_vals:
-        #     data_table.append([bar.getElementAsFloat(self.OPEN),
-        #                  bar.getElementAsFloat(self.HIGH),
-        #                  bar.getElementAsFloat(self.LOW),
-        #                  bar.getElementAsFloat(self.CLOSE),
-        #                  bar.getElementAsInteger(self.VOLUME),
-        #                  bar.getElementAsInteger(self.NUM_EVENTS)])
-        #
-        #     time_list.append(bar.getElementAsDatetime(self.TIME))
-
-        # each price time point has multiple fields - marginally quicker
-        tuple = [([bar.getElementAsFloat(self.OPEN),
-                        bar.getElementAsFloat(self.HIGH),
-                        bar.getElementAsFloat(self.LOW),
-                        bar.getElementAsFloat(self.CLOSE),
-                        bar.getElementAsInteger(self.VOLUME),
-                        bar.getElementAsInteger(self.NUM_EVENTS)],
-                        bar.getElementAsDatetime(self.TIME)) for bar in data_vals]
-
-        data_table = list(map(itemgetter(0), tuple))
-        time_list = list(map(itemgetter(1), tuple))
-
-        try:
-            self.logger.info("Dates between " + str(time_list[0]) + " - " + str(time_list[-1]))
-        except:
-            self.logger.info("No dates retrieved")
-            return None
-
-        # create pandas dataframe with the Bloomberg output
-        return pandas.DataFrame(data = data_table, index = time_list,
-                      columns=['open', 'high', 'low', 'close', 'volume', 'events'])
+        return self.decode_arrays(data, [self.OPEN, self.HIGH, self.LOW, self.CLOSE],
+                                  integer_fields = [self.VOLUME, self.NUM_EVENTS])
 
     # implement abstract method: create request for data
     def send_bar_request(self, session, eventQueue):
@@ -631,8 +621,37 @@ class BBGLowLevelTick(BBGLowLevelTemplate):
         self.MESSAGE = blpapi.Name("message")
         self.SESSION_TERMINATED = blpapi.Name("SessionTerminated")
 
-    def combine_slices(self, data_frame, data_frame_slice):
-        return data_frame.append(data_frame_slice)
+        self._bar_aggregator = None
+
+    def load_time_series(self, time_series_request):
+        # if bars have been requested, aggregate each chunk of ticks as it arrives, rather than collecting every tick
+        if hasattr(time_series_request, 'bar_freq'):
+            self._bar_aggregator = TimeSeriesBarAggregator(time_series_request.bar_freq, price_field = 'close',
+                                                           volume_fields = ['ticksize'])
+        else:
+            self._bar_aggregator = None
+
+        data_frame = super(BBGLowLevelTick, self).load_time_series(time_series_request)
+
+        if self._bar_aggregator is not None:
+            return self._bar_aggregator.get_bars()
+
+        return data_frame
+
+    def process_response_event(self, event):
+        data_frame_slices = super(BBGLowLevelTick, self).process_response_event(event)
+
+        if self._bar_aggregator is not None:
+            for data_frame_slice in data_frame_slices:
+                self._bar_aggregator.add_ticks(self.combine_slices([data_frame_slice]))
+
+            return []
+
+        return data_frame_slices
+
+    def combine_slices(self, data_frame_slices):
+        # several ticks can have the same time, so we can't use the index to spot duplicates
+        return self.combine_array_slices(data_frame_slices, ['close'], integer_columns = ['ticksize'])
 
     # populate options for Bloomberg request for asset intraday request
     def fill_options(self, time_series_request):
@@ -653,44 +672,15 @@ class BBGLowLevelTick(BBGLowLevelTemplate):
 
         return self._options
 
-    # iterate through Bloomberg output creating a DataFrame output
+    # iterate through Bloomberg output creating arrays of the times and fields
     # implements abstract method
     def process_message(self, msg):
         data = msg.getElement(self.TICK_DATA).getElement(self.TICK_DATA)
 
         self.logger.info("Processing tick data for " + str(self._options.security))
-        tuple = []
-
-        data_vals = data.values()
-
-        # for item in list(data_vals):
-        #     if item.hasElement(self.COND_CODE):
-        #         cc = item.getElementAsString(self.COND_CODE)
-        #     else:
-        #         cc = ""
-        #
-        #     # each price time point has multiple fields - marginally quicker
-        #     tuple.append(([item.getElementAsFloat(self.VALUE),
-        #                     item.getElementAsInteger(self.TICK_SIZE)],
-        #                     item.getElementAsDatetime(self.TIME)))
-
-        # slightly faster this way (note, we are skipping trade & CC fields)
-        tuple = [([item.getElementAsFloat(self.VALUE),
-                             item.getElementAsInteger(self.TICK_SIZE)],
-                             item.getElementAsDatetime(self.TIME)) for item in data_vals]
-
-        data_table = list(map(itemgetter(0), tuple))
-        time_list = list(map(itemgetter(1), tuple))
-
-        try:
-            self.logger.info("Dates between " + str(time_list[0]) + " - " + str(time_list[-1]))
-        except:
-            self.logger.info("No dates retrieved")
-            return None
 
-        # create pandas dataframe with the Bloomberg output
-        return pandas.DataFrame(data = data_table, index = time_list,
-                      columns=['close', 'ticksize'])
+        # note, we are skipping trade & CC fields
+        return self.decode_arrays(data, [self.VALUE], integer_fields = [self.TICK_SIZE])
 
     # implement abstract method: create request for data
     def send_bar_request(self, session, eventQueue):
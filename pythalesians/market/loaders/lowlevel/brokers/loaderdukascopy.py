@@ -19,21 +19,30 @@ Class for downloading tick data from DukasCopy (note: past month of data is not
 histories is not recommended as you will likely run out memory given the amount of data requested.
 
 Parsing of files is rewritten version https://github.com/nelseric/ticks/
-- parsing has been speeded up considerably
+- parsing has been speeded up considerably (whole files are decoded in one go with a NumPy record dtype)
 - on-the-fly downloading/parsing
 
 """
 
 import requests
 import pandas
+import numpy
 
 import os
+import collections
+import json
+import calendar
+import datetime
+import email.utils
+import threading
+import time as time_lib
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 try:
-    from numba import jit
-finally:
-    pass
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
 
 # decompress binary files fetched from Dukascopy
 try:
@@ -44,6 +53,11 @@ except ImportError:
 # abstract class on which this is based
 from pythalesians.market.loaders.lowlevel.loadertemplate import LoaderTemplate
 
+# for market hours, aggregating ticks into bars and compact storage of ticks
+from pythalesians.timeseries.calcs.timeseriesfilter import TimeSeriesFilter
+from pythalesians.timeseries.calcs.timeseriesbaraggregator import TimeSeriesBarAggregator
+from pythalesians.timeseries.calcs.compactticks import CompactTicks
+
 # for logging and constants
 from pythalesians.util.loggermanager import LoggerManager
 from pythalesians.util.constants import Constants
@@ -51,9 +65,39 @@ from pythalesians.util.constants import Constants
 class LoaderDukasCopy(LoaderTemplate):
     tick_name  = "{symbol}/{year}/{month}/{day}/{hour}h_ticks.bi5"
 
+    # each tick is 20 bytes, big endian: millisecond offset from the hour, two integer prices and two float volumes
+    tick_dtype = numpy.dtype([('temp', '>u4'), ('bid', '>u4'), ('ask', '>u4'), ('bidv', '>f4'), ('askv', '>f4')])
+
+    # download settings: hours fetched concurrently, connections allowed per host and retries (with exponential backoff)
+    thread_no = 8
+    host_connection_limit = 8
+    retry_no = 5
+    retry_backoff = 0.5 # seconds, doubled after each failed try
+    retry_after_max = 60 # seconds, longest we'll wait when a throttled response asks us to wait (Retry-After)
+    throttle_status_codes = [429, 503]
+    timeout = 30
+
+    # don't request hours when the FX market is closed (apart from those next to the open/close, if probing)
+    skip_closed_hours = True
+    probe_boundary_hours = True
+
+    # when the local tick archive is used, also store each hour decoded as a NumPy array (skips LZMA on re-reads)
+    archive_decoded = False
+
+    # HTTP session (with a pool of keep-alive connections) shared across all instances of object!
+    _session = None
+    _session_pool_size = None
+    _host_semaphores = {}
+    _session_lock = threading.Lock()
+
     def __init__(self):
         super(LoaderTemplate, self).__init__()
         self.logger = LoggerManager().getLogger(__name__)
+        self.base_url = Constants().dukascopy_base_url
+        self.archive_folder = Constants().temp_pythalesians_folder + "/dkticks/"
+
+        self._manifest = {}
+        self._manifest_lock = threading.Lock()
 
         import logging
         logging.getLogger("requests").setLevel(logging.WARNING)
@@ -125,31 +169,127 @@ class LoaderDukasCopy(LoaderTemplate):
     def download_tick(self, time_series_request):
 
         symbol = time_series_request.tickers[0]
-        df_list = []
 
         self.logger.info("About to download from Dukascopy... for " + symbol)
 
-        # single threaded
-        df_list = [self.fetch_file(time, symbol) for time in
-                  self.hour_range(time_series_request.start_date, time_series_request.finish_date)]
+        time_list = list(self.hour_range(time_series_request.start_date, time_series_request.finish_date))
 
-        # TODO parallel (has pickle issues)
-        # time_list = self.hour_range(time_series_request.start_date, time_series_request.finish_date)
-        # import multiprocessing_on_dill as multiprocessing
-        #
-        # pool = multiprocessing.Pool(processes=4)
-        # results = [pool.apply_async(self.fetch_file, args=(time, symbol)) for time in time_list]
-        # df_list = [p.get() for p in results]
+        try:
+            # aggregate each hour into bars as soon as it is parsed, so we never hold all the ticks
+            if hasattr(time_series_request, 'bar_freq'):
+                aggregator = TimeSeriesBarAggregator(time_series_request.bar_freq, volume_fields = ['bidv', 'askv'])
+
+                for df in self.iter_files(time_list, symbol):
+                    aggregator.add_ticks(df)
+
+                return aggregator.get_bars()
+
+            df_list = self.fetch_files(time_list, symbol)
+        finally:
+            if Constants().dukascopy_write_temp_tick_disk: self.save_manifest(symbol)
 
         try:
             return pandas.concat(df_list)
         except:
             return None
 
-    def fetch_file(self, time, symbol):
-        if time.hour % 24 == 0: self.logger.info("Downloading... " + str(time))
+    def download_tick_compact(self, time_series_request):
+        """
+        download_tick_compact - Downloads ticks for the first ticker, keeping them as CompactTicks (integer prices,
+        millisecond offsets and float32 volumes) rather than a DataFrame
+
+        Parameters
+        ----------
+        time_series_request : TimeSeriesRequest
+            contains start/finish dates and (Dukascopy) tickers
+
+        Returns
+        -------
+        CompactTicks
+        """
+
+        symbol = time_series_request.tickers[0]
+
+        self.logger.info("About to download from Dukascopy (compact)... for " + symbol)
+
+        time_list = list(self.hour_range(time_series_request.start_date, time_series_request.finish_date))
+
+        try:
+            return CompactTicks.concat(self.fetch_files(time_list, symbol, compact = True))
+        finally:
+            if Constants().dukascopy_write_temp_tick_disk: self.save_manifest(symbol)
+
+    def fetch_files(self, time_list, symbol, compact = False):
+        """
+        fetch_files - Downloads and parses several hours of ticks concurrently, returning them in the same order as
+        time_list
+
+        Parameters
+        ----------
+        time_list : list(DateTime)
+            hours to download
+        symbol : str
+            Dukascopy ticker
+        compact : bool
+            return CompactTicks rather than DataFrames
+
+        Returns
+        -------
+        list(DataFrame)
+        """
+
+        return list(self.iter_files(time_list, symbol, compact = compact))
+
+    def iter_files(self, time_list, symbol, compact = False):
+        """
+        iter_files - Downloads and parses several hours of ticks concurrently (using threads, given we are mostly
+        waiting on the network), yielding them in the same order as time_list. Only a limited window of hours is in
+        flight at once, so memory use doesn't grow with the length of time_list.
+
+        Parameters
+        ----------
+        time_list : list(DateTime)
+            hours to download
+        symbol : str
+            Dukascopy ticker
+        compact : bool
+            yield CompactTicks rather than DataFrames
+
+        Returns
+        -------
+        generator of DataFrame
+        """
+
+        fetch = self.fetch_compact if compact else self.fetch_file
+
+        if self.thread_no <= 1 or len(time_list) <= 1:
+            for time in time_list:
+                yield fetch(time, symbol)
+
+            return
+
+        executor = ThreadPoolExecutor(max_workers = min(self.thread_no, len(time_list)))
+
+        window = self.thread_no * 4
+        futures = collections.deque()
+
+        try:
+            # results are taken in order of submission, so hours are reassembled in the right order
+            for time in time_list:
+                futures.append(executor.submit(fetch, time, symbol))
+
+                if len(futures) >= window:
+                    yield futures.popleft().result()
+
+            while len(futures) > 0:
+                yield futures.popleft().result()
+        finally:
+            for future in futures: future.cancel()
 
-        tick_path = self.tick_name.format(
+            executor.shutdown(wait = True)
+
+    def get_tick_path(self, time, symbol):
+        return self.tick_name.format(
                 symbol = symbol,
                 year = str(time.year).rjust(4, '0'),
                 month = str(time.month).rjust(2, '0'),
@@ -157,103 +297,477 @@ class LoaderDukasCopy(LoaderTemplate):
                 hour = str(time.hour).rjust(2, '0')
             )
 
-        tick = self.fetch_tick(Constants().dukascopy_base_url + tick_path)
+    def fetch_file(self, time, symbol):
+        records = self.fetch_records(time, symbol)
+
+        if records is None: return None
 
-        if Constants().dukascopy_write_temp_tick_disk:
-            out_path = Constants().temp_pythalesians_folder + "/dkticks/" + tick_path
+        return self.retrieve_df(records, symbol, time)
 
-            if not os.path.exists(out_path):
-                if not os.path.exists(os.path.dirname(out_path)):
-                    os.makedirs(os.path.dirname(out_path))
+    def fetch_compact(self, time, symbol):
+        records = self.fetch_records(time, symbol)
 
-            self.write_tick(tick, out_path)
+        if records is None: return None
+
+        return CompactTicks.from_records(records, symbol, self.get_price_scale(symbol), time)
+
+    def fetch_records(self, time, symbol):
+        """
+        fetch_records - Gets an hour of ticks, from the local archive if possible, otherwise from Dukascopy
+
+        Parameters
+        ----------
+        time : DateTime
+            hour to fetch
+        symbol : str
+            Dukascopy ticker
+
+        Returns
+        -------
+        numpy.ndarray (with tick_dtype records, None if there is no data for the hour)
+        """
+        tick_path = self.get_tick_path(time, symbol)
+
+        use_archive = Constants().dukascopy_write_temp_tick_disk
+
+        # check the local archive before going to the network
+        if use_archive:
+            status, records = self.read_archived_file(time, symbol, tick_path)
+
+            if status is not None: return records
+
+        if time.hour % 24 == 0: self.logger.info("Downloading... " + str(time))
+
+        tick = self.fetch_tick(self.base_url + tick_path)
 
         try:
-            return self.retrieve_df(lzma.decompress(tick), symbol, time)
+            data = lzma.decompress(tick)
         except:
-            return None
+            data = None
+
+        # tick is None if the download failed (in which case we can't say anything about the hour)
+        if use_archive and tick is not None:
+            self.archive_file(time, symbol, tick_path, tick, data)
+
+        if data is None: return None
+
+        return self.parse_tick_records(data)
+
+    ### functions for the local archive of tick files
+    def get_manifest(self, symbol):
+        """
+        get_manifest - Gets the index of archived hours for a symbol (hour key => 'data' or 'empty'), loading it from
+        disk on first use
+
+        Parameters
+        ----------
+        symbol : str
+            Dukascopy ticker
+
+        Returns
+        -------
+        dict
+        """
+
+        with self._manifest_lock:
+            if symbol not in self._manifest:
+                manifest = {}
+
+                try:
+                    with open(self.get_manifest_path(symbol), 'r') as f:
+                        manifest = json.load(f)
+                except: pass
+
+                self._manifest[symbol] = manifest
+
+            return self._manifest[symbol]
+
+    def get_manifest_path(self, symbol):
+        return self.archive_folder + symbol + "/manifest.json"
+
+    def save_manifest(self, symbol):
+        """
+        save_manifest - Writes the index of archived hours for a symbol to disk (via a temp file, so that a crash
+        can't leave a half written manifest)
+
+        Parameters
+        ----------
+        symbol : str
+            Dukascopy ticker
+        """
+
+        if symbol not in self._manifest: return
+
+        manifest_path = self.get_manifest_path(symbol)
+
+        if not os.path.exists(os.path.dirname(manifest_path)):
+            os.makedirs(os.path.dirname(manifest_path))
+
+        with self._manifest_lock:
+            with open(manifest_path + ".temp", 'w') as f:
+                json.dump(self._manifest[symbol], f, sort_keys = True)
+
+        # delete the old copy and rename
+        try:
+            os.remove(manifest_path)
+        except: pass
+
+        os.rename(manifest_path + ".temp", manifest_path)
+
+    def get_hour_key(self, time):
+        return time.strftime('%Y%m%d%H')
+
+    def get_hour_end_epoch(self, time):
+        # times are in UTC
+        return calendar.timegm((time + timedelta(hours = 1)).timetuple())
+
+    def is_complete_hour(self, time):
+        return self.get_hour_end_epoch(time) <= calendar.timegm(datetime.datetime.utcnow().timetuple())
+
+    def get_decoded_path(self, out_path):
+        return out_path[:-len(".bi5")] + ".npy"
+
+    def read_archived_file(self, time, symbol, tick_path):
+        """
+        read_archived_file - Reads an hour of ticks from the local archive
+
+        Parameters
+        ----------
+        time : DateTime
+            hour to read
+        symbol : str
+            Dukascopy ticker
+        tick_path : str
+            path of the tick file (relative to archive)
+
+        Returns
+        -------
+        str ('data', 'empty' or None if the hour needs to be downloaded), numpy.ndarray (with tick_dtype records)
+        """
+
+        manifest = self.get_manifest(symbol)
+        key = self.get_hour_key(time)
+        status = manifest.get(key)
+
+        # weekends/holidays etc.
+        if status == 'empty': return status, None
+
+        out_path = self.archive_folder + tick_path
+
+        if status == 'data' and self.archive_decoded:
+            decoded_path = self.get_decoded_path(out_path)
+
+            if os.path.isfile(decoded_path):
+                try:
+                    return status, numpy.load(decoded_path, mmap_mode = 'r')
+                except: pass
+
+        if not os.path.isfile(out_path): return None, None
+
+        # files which aren't in the manifest (eg. from before it existed) are only used if they were written after
+        # the end of the hour, otherwise they could be partial
+        if status is None and os.path.getmtime(out_path) < self.get_hour_end_epoch(time): return None, None
+
+        try:
+            with open(out_path, 'rb') as f:
+                data = lzma.decompress(f.read())
+        except:
+            # truncated/corrupted file, so download again
+            return None, None
+
+        if status is None:
+            with self._manifest_lock:
+                manifest[key] = 'data'
+
+        records = self.parse_tick_records(data)
+
+        # decode once, so next time we can skip LZMA
+        if self.archive_decoded:
+            numpy.save(self.get_decoded_path(out_path), records)
+
+        return 'data', records
+
+    def archive_file(self, time, symbol, tick_path, tick, data):
+        """
+        archive_file - Stores a downloaded hour in the local archive, and records it in the manifest if the hour
+        has finished
+
+        Parameters
+        ----------
+        time : DateTime
+            hour of the tick file
+        symbol : str
+            Dukascopy ticker
+        tick_path : str
+            path of the tick file (relative to archive)
+        tick : bytes
+            compressed file as downloaded
+        data : bytes
+            decompressed file (None if couldn't be decompressed)
+        """
+
+        if len(tick) == 0:
+            status = 'empty'
+        elif data is not None:
+            status = 'data'
+
+            out_path = self.archive_folder + tick_path
+
+            if not os.path.exists(os.path.dirname(out_path)):
+                os.makedirs(os.path.dirname(out_path))
+
+            self.write_tick(tick, out_path)
+
+            if self.archive_decoded:
+                numpy.save(self.get_decoded_path(out_path), self.parse_tick_records(data))
+        else:
+            return
+
+        # don't record hours which are still in progress (we'll need to download them again)
+        if self.is_complete_hour(time):
+            manifest = self.get_manifest(symbol)
+
+            with self._manifest_lock:
+                manifest[self.get_hour_key(time)] = status
+
+    def get_session(self):
+        """
+        get_session - Gets the HTTP session shared by all download threads (creating it on first use)
+
+        Returns
+        -------
+        requests.Session
+        """
+
+        with LoaderDukasCopy._session_lock:
+            # recreate if connection limit has been changed since the session was made
+            if LoaderDukasCopy._session is None or LoaderDukasCopy._session_pool_size != self.host_connection_limit:
+                session = requests.Session()
+
+                adapter = requests.adapters.HTTPAdapter(pool_connections = 4, pool_maxsize = self.host_connection_limit)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                LoaderDukasCopy._session = session
+                LoaderDukasCopy._session_pool_size = self.host_connection_limit
+
+            return LoaderDukasCopy._session
+
+    def get_host_semaphore(self, url):
+        key = (urlparse(url).netloc, self.host_connection_limit)
+
+        with LoaderDukasCopy._session_lock:
+            if key not in LoaderDukasCopy._host_semaphores:
+                LoaderDukasCopy._host_semaphores[key] = threading.BoundedSemaphore(self.host_connection_limit)
+
+            return LoaderDukasCopy._host_semaphores[key]
 
     def fetch_tick(self, tick_url):
-        i = 0
-        tick_request = None
+        session = self.get_session()
+        host_semaphore = self.get_host_semaphore(tick_url)
+
+        for i in range(0, self.retry_no):
+            wait = self.retry_backoff * (2 ** i)
 
-        # try up to 5 times to download
-        while i < 5:
             try:
-                tick_request = requests.get(tick_url)
-                i = 5
-            except:
-                i = i + 1
+                # limit the number of simultaneous connections to each host
+                with host_semaphore:
+                    tick_request = session.get(tick_url, timeout = self.timeout)
 
-        if (tick_request is None):
-            self.logger("Failed to download from " + tick_url)
-            return None
+                status_code = tick_request.status_code
+
+                # hours without any data are missing on the server
+                if status_code == 404:
+                    return b''
+
+                if status_code < 400:
+                    return tick_request.content
+
+                # throttled, so wait at least as long as the server asks before retrying
+                if status_code in self.throttle_status_codes:
+                    self.logger.warning("Throttled (" + str(status_code) + ") by " + tick_url)
+
+                    wait = max(wait, self.get_retry_after(tick_request))
+
+                # other client side errors won't be fixed by retrying, and the body isn't tick data
+                elif status_code < 500:
+                    self.logger.error("Failed to download from " + tick_url + " (" + str(status_code) + ")")
+
+                    return None
+            except requests.exceptions.RequestException:
+                pass
+
+            if i < self.retry_no - 1:
+                time_lib.sleep(wait)
+
+        self.logger.error("Failed to download from " + tick_url)
+
+        return None
 
-        return tick_request.content
+    def get_retry_after(self, tick_request):
+        """
+        get_retry_after - Gets the number of seconds a server asks us to wait before retrying, from the Retry-After
+        header (either in seconds or as a date), capped at retry_after_max
+
+        Parameters
+        ----------
+        tick_request : requests.Response
+            throttled response
+
+        Returns
+        -------
+        float - 0 if there isn't a valid Retry-After header
+        """
+        retry_after = tick_request.headers.get('Retry-After')
+
+        if retry_after is None: return 0
+
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            date = email.utils.parsedate_tz(retry_after)
+
+            if date is None: return 0
+
+            seconds = email.utils.mktime_tz(date) - time_lib.time()
+
+        return min(max(seconds, 0), self.retry_after_max)
 
     def write_tick(self, content, out_path):
         data_file = open(out_path, "wb+")
         data_file.write(content)
         data_file.close()
 
-    def chunks(self, list, n):
-        if n < 1:
-            n = 1
-        return [list[i:i + n] for i in range(0, len(list), n)]
-
     def retrieve_df(self, data, symbol, epoch):
-        date, tuple = self.parse_tick_data(data, epoch)
+        date, ticks = self.parse_tick_data(data, epoch)
 
-        df = pandas.DataFrame(data = tuple, columns=['temp', 'bid', 'ask', 'bidv', 'askv'], index = date)
-        df.drop('temp', axis = 1)
-        df.index.name = 'Date'
+        divisor = self.get_price_scale(symbol)
 
-        divisor = 100000
+        # fill a single block, column by column (order = 'F', as pandas stores it), which the DataFrame takes without
+        # copying (creating a DataFrame from a dict of columns costs more than the decoding for an hour of ticks)
+        values = numpy.empty((len(ticks), 4), dtype = numpy.float64, order = 'F')
 
-        # where JPY is the terms currency we have different divisor
-        if symbol[3:6] == 'JPY':
-            divisor = 1000
+        values[:, 0] = ticks['bid']
+        values[:, 1] = ticks['ask']
+        values[:, 2] = ticks['bidv']
+        values[:, 3] = ticks['askv']
 
-        # prices are returned without decimal point
-        df['bid'] =  df['bid'] /  divisor
-        df['ask'] =  df['ask'] / divisor
+        # prices are returned without decimal point (divide whole arrays at once, rather than row by row)
+        values[:, 0:2] /= divisor
+
+        df = pandas.DataFrame(values, index = date, columns = ['bid', 'ask', 'bidv', 'askv'], copy = False)
+        df.index.name = 'Date'
 
         return df
 
+    def get_price_scale(self, symbol):
+        # prices are returned without decimal point, where JPY is the terms currency we have different divisor
+        if symbol[3:6] == 'JPY':
+            return 1000.0
+
+        return 100000.0
+
     def hour_range(self, start_date, end_date):
-          delta_t = end_date - start_date
+        """
+        hour_range - Generates every hour between start and end date (excluding hours when the FX market is closed,
+        if skip_closed_hours is set)
+
+        Parameters
+        ----------
+        start_date : DateTime
+            start date
+        end_date : DateTime
+            finish date
+
+        Returns
+        -------
+        generator of DateTime
+        """
+        delta_t = end_date - start_date
+
+        delta_hours = (delta_t.days *  24.0) + (delta_t.seconds / 3600.0)
+
+        time_list = [start_date + timedelta(0, 0, 0, 0, 0, n) for n in range(int (delta_hours))] # Hours
+
+        if self.skip_closed_hours and len(time_list) > 0:
+            keep = self.get_market_open_mask(pandas.DatetimeIndex(time_list))
 
-          delta_hours = (delta_t.days *  24.0) + (delta_t.seconds / 3600.0)
+            # also keep closed hours next to an open one, in case the market opens early/closes late
+            if self.probe_boundary_hours:
+                keep_left = numpy.append(keep[1:], False)
+                keep_right = numpy.insert(keep[:-1], 0, False)
 
-          for n in range(int (delta_hours)):
-              yield start_date + timedelta(0, 0, 0, 0, 0, n) # Hours
+                keep = keep | keep_left | keep_right
+
+            time_list = [time_list[i] for i in numpy.flatnonzero(keep)]
+
+        for time in time_list:
+            yield time
+
+    def get_market_open_mask(self, hours):
+        """
+        get_market_open_mask - Finds which hours the FX market is open (closed between 17:00 New York time on Friday
+        and 17:00 on Sunday, and on FX holidays)
+
+        Parameters
+        ----------
+        hours : DatetimeIndex
+            hours to check (assumed to be UTC if no time zone)
+
+        Returns
+        -------
+        numpy.ndarray (bool)
+        """
+
+        if hours.tz is None: hours = hours.tz_localize('UTC')
+
+        ny = hours.tz_convert('America/New_York')
+
+        # Monday = 0, ..., Sunday = 6
+        day_of_week = numpy.asarray(ny.dayofweek)
+        hour = numpy.asarray(ny.hour)
+
+        closed = ((day_of_week == 4) & (hour >= 17)) | (day_of_week == 5) | ((day_of_week == 6) & (hour < 17))
+
+        days = ny.tz_localize(None).normalize()
+
+        holidays = TimeSeriesFilter().get_holidays(days[0], days[-1], cal = 'FX')
+
+        closed = closed | numpy.asarray(days.isin(holidays))
+
+        return ~closed
 
     def parse_tick_data(self, data, epoch):
-        import struct
+        """
+        parse_tick_data - Decodes a decompressed Dukascopy tick file in a single pass (no per row unpacking)
 
-        # tick = namedtuple('Tick', 'Date ask bid askv bidv')
+        Parameters
+        ----------
+        data : bytes
+            decompressed contents of a bi5 file (or array of tick_dtype records)
+        epoch : DateTime
+            hour which the file refers to
 
-        chunks_list = self.chunks(data, 20)
-        parsed_list = []
-        date = []
+        Returns
+        -------
+        DatetimeIndex, numpy.ndarray (with tick_dtype records)
+        """
 
-        # note: Numba can speed up for loops
-        for row in chunks_list:
-            d = struct.unpack(">LLLff", row)
-            date.append((epoch + timedelta(0,0,0, d[0])))
+        ticks = self.parse_tick_records(data)
 
-            # SLOW: no point using named tuples!
-            # row_data = tick._asdict(tick._make(d))
-            # row_data['Date'] = (epoch + timedelta(0,0,0,row_data['Date']))
+        # add the millisecond offsets to the hour in one vectorised step
+        date = pandas.DatetimeIndex(numpy.datetime64(pandas.Timestamp(epoch).tz_localize(None), 'ms')
+                                    + ticks['temp'].astype(numpy.int64).astype('timedelta64[ms]'))
 
-            parsed_list.append(d)
+        return date, ticks
 
-        return date, parsed_list
+    def parse_tick_records(self, data):
+        if isinstance(data, numpy.ndarray): return data
 
-    def chunks(self, list, n):
-        if n < 1: n = 1
+        # ignore any trailing partial record (eg. from truncated downloads)
+        length = len(data) - (len(data) % self.tick_dtype.itemsize)
 
-        return [list[i:i + n] for i in range(0, len(list), n)]
+        return numpy.frombuffer(data, dtype = self.tick_dtype, count = length // self.tick_dtype.itemsize)
 
     def get_daily_data(self):
         pass
@@ -23,6 +23,7 @@ import abc
 import copy
 
 from pythalesians.util.configmanager import ConfigManager
+from pythalesians.timeseries.calcs.timeseriesbaraggregator import TimeSeriesBarAggregator
 
 class LoaderTemplate:
     def __init__(self):
@@ -104,14 +105,13 @@ class LoaderTemplate:
         if isinstance(fields_list, str):
             fields_list = [fields_list]
 
-        if self.config is None: return fields_list
-
-        fields_converted = []
+        # bar fields are computed from the ticks, so the loader downloads whatever it needs to create them
+        if hasattr(time_series_request, 'bar_freq'):
+            fields_list = [x for x in fields_list if x not in TimeSeriesBarAggregator.BAR_FIELDS]
 
-        for field in fields_list:
-            fields_converted.append(self.config.convert_library_to_vendor_field(source, field))
+        if self.config is None: return fields_list
 
-        return fields_converted
+        return self.config.convert_library_to_vendor_field_list(source, fields_list)
 
     # translate Thalesians ticker to vendor ticker
     def translate_to_vendor_ticker(self, time_series_request):
@@ -142,13 +142,7 @@ class LoaderTemplate:
 
         if self.config is None: return tickers_list
 
-        tickers_list_converted = []
-
-        for ticker in tickers_list:
-            tickers_list_converted.append(
-                self.config.convert_library_to_vendor_ticker(category, source, freq, cut, ticker))
-
-        return tickers_list_converted
+        return self.config.convert_library_to_vendor_ticker_list(category, source, freq, cut, tickers_list)
 
     def translate_from_vendor_field(self, vendor_fields_list, time_series_request):
         """
@@ -173,6 +167,28 @@ class LoaderTemplate:
 
         fields_converted = []
 
+        # bars aggregated from ticks: bar fields are already Thalesians fields, and any other (volume) fields which
+        # aren't in the configuration files are kept with their vendor names
+        if hasattr(time_series_request, 'bar_freq'):
+            dictionary = {}
+
+            if hasattr(time_series_request, 'vendor_fields'):
+                dictionary = dict(zip(time_series_request.vendor_fields, time_series_request.fields))
+
+            for vendor_field in vendor_fields_list:
+                if vendor_field in TimeSeriesBarAggregator.BAR_FIELDS:
+                    fields_converted.append(vendor_field)
+                elif vendor_field in dictionary:
+                    fields_converted.append(dictionary[vendor_field])
+                else:
+                    try:
+                        fields_converted.append(
+                            self.config.convert_vendor_to_library_field_list(data_source, [vendor_field])[0])
+                    except:
+                        fields_converted.append(vendor_field)
+
+            return fields_converted
+
         # if we haven't set the configuration files for automatic configuration
         if hasattr(time_series_request, 'vendor_fields'):
 
@@ -186,8 +202,7 @@ class LoaderTemplate:
 
         # otherwise used stored configuration files
         else:
-            for vendor_field in vendor_fields_list:
-                fields_converted.append(self.config.convert_vendor_to_library_field(data_source, vendor_field))
+            fields_converted = self.config.convert_vendor_to_library_field_list(data_source, vendor_fields_list)
 
         return fields_converted
 
@@ -225,10 +240,4 @@ class LoaderTemplate:
 
         if self.config is None: return vendor_tickers_list
 
-        tickers_converted = []
-
-        for vendor_ticker in vendor_tickers_list:
-            tickers_converted.append(
-                self.config.convert_vendor_to_library_ticker(data_source, vendor_ticker))
-
-        return tickers_converted
\ No newline at end of file
+        return self.config.convert_vendor_to_library_ticker_list(data_source, vendor_tickers_list)
\ No newline at end of file
@@ -0,0 +1,219 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+TickerBatchPlanner
+
+Works out how to split a list of tickers into batches (one vendor request per batch) for each data source. Batches
+are never bigger than the cap for the data source, and are as even as possible. The number of batches is picked to
+minimise the expected time to download them all with the threads available, using the latencies of previous requests
+to that data source, which are modelled as a fixed overhead per request plus a cost per ticker (fitted to the recent
+requests, with older ones counting for less). When batches would take the same time, the fewest requests are made.
+
+"""
+
+import math
+import threading
+
+class TickerBatchPlanner:
+
+    def __init__(self, caps = None, overhead = 1.0, per_ticker = 0.01, decay = 0.95):
+        """
+        __init__ - Creates a planner with no latency statistics
+
+        Parameters
+        ----------
+        caps : dict (optional)
+            data source => maximum tickers per request ('other' for any data source not listed)
+        overhead : float
+            seconds per request assumed before any requests to a data source have been timed
+        per_ticker : float
+            seconds per ticker assumed before requests with different numbers of tickers have been timed
+        decay : float
+            weight of each timed request is multiplied by this after every later request to the same data source
+        """
+        if caps is None: caps = {'bloomberg' : 50, 'other' : 100}
+
+        self.caps = dict(caps)
+        self.overhead = overhead
+        self.per_ticker = per_ticker
+        self.decay = decay
+
+        self._lock = threading.Lock()
+
+        self.reset_stats()
+
+    def set_cap(self, data_source, cap):
+        with self._lock:
+            self.caps[data_source] = cap
+
+    def get_cap(self, data_source):
+        with self._lock:
+            if data_source in self.caps: return self.caps[data_source]
+
+            return self.caps['other']
+
+    def reset_stats(self):
+        with self._lock:
+            # data source => decayed sums of weight, tickers, seconds, tickers^2 and tickers * seconds (and counts)
+            self._sums = {}
+
+    def record(self, data_source, ticker_no, seconds):
+        """
+        record - Adds the time a request took to the statistics for its data source
+
+        Parameters
+        ----------
+        data_source : str
+            data source of the request
+        ticker_no : int
+            number of tickers in the request
+        seconds : float
+            time from sending the request to having the time series
+        """
+        if ticker_no <= 0: return
+
+        with self._lock:
+            if data_source not in self._sums:
+                self._sums[data_source] = {'w' : 0.0, 'x' : 0.0, 'y' : 0.0, 'xx' : 0.0, 'xy' : 0.0,
+                                           'calls' : 0, 'tickers' : 0, 'seconds' : 0.0}
+
+            s = self._sums[data_source]
+
+            for k in ['w', 'x', 'y', 'xx', 'xy']: s[k] = s[k] * self.decay
+
+            s['w'] = s['w'] + 1.0
+            s['x'] = s['x'] + ticker_no
+            s['y'] = s['y'] + seconds
+            s['xx'] = s['xx'] + ticker_no * ticker_no
+            s['xy'] = s['xy'] + ticker_no * seconds
+
+            s['calls'] = s['calls'] + 1
+            s['tickers'] = s['tickers'] + ticker_no
+            s['seconds'] = s['seconds'] + seconds
+
+    def get_latency_model(self, data_source):
+        """
+        get_latency_model - Gets the expected seconds per request and per ticker for a data source
+
+        Parameters
+        ----------
+        data_source : str
+            data source
+
+        Returns
+        -------
+        float, float - overhead (seconds per request), per ticker (seconds per ticker)
+        """
+        with self._lock:
+            if data_source not in self._sums: return self.overhead, self.per_ticker
+
+            s = self._sums[data_source]
+
+        mean_x = s['x'] / s['w']
+        mean_y = s['y'] / s['w']
+
+        var_x = s['xx'] / s['w'] - mean_x * mean_x
+
+        # need requests with different numbers of tickers to tell the overhead and cost per ticker apart
+        if var_x > 1e-6 * max(1.0, mean_x * mean_x):
+            per_ticker = max(0.0, (s['xy'] / s['w'] - mean_x * mean_y) / var_x)
+        else:
+            per_ticker = self.per_ticker
+
+        overhead = max(0.0, mean_y - per_ticker * mean_x)
+
+        return overhead, per_ticker
+
+    def get_stats(self, data_source):
+        """
+        get_stats - Gets the latency statistics for a data source
+
+        Parameters
+        ----------
+        data_source : str
+            data source
+
+        Returns
+        -------
+        dict
+        """
+        overhead, per_ticker = self.get_latency_model(data_source)
+
+        with self._lock:
+            s = self._sums.get(data_source, {'calls' : 0, 'tickers' : 0, 'seconds' : 0.0})
+
+            stats = {'calls' : s['calls'], 'tickers' : s['tickers'], 'seconds' : s['seconds'],
+                     'overhead' : overhead, 'per_ticker' : per_ticker}
+
+        if stats['calls'] > 0: stats['mean_seconds'] = stats['seconds'] / stats['calls']
+
+        return stats
+
+    def plan(self, data_source, ticker_no, thread_no = 1):
+        """
+        plan - Splits tickers into batches for a data source
+
+        Parameters
+        ----------
+        data_source : str
+            data source
+        ticker_no : int
+            number of tickers to download
+        thread_no : int
+            number of requests which can be made at the same time
+
+        Returns
+        -------
+        list(int, int) - start and finish position of the tickers in each batch
+        """
+        if ticker_no <= 0: return []
+
+        cap = max(1, self.get_cap(data_source))
+        thread_no = max(1, thread_no)
+
+        overhead, per_ticker = self.get_latency_model(data_source)
+
+        best_batch_no = None
+        best_seconds = None
+
+        # in order of fewest requests first, so these win any ties
+        for batch_no in range(int(math.ceil(ticker_no / float(cap))), ticker_no + 1):
+            batch_size = int(math.ceil(ticker_no / float(batch_no)))
+
+            # batches are downloaded in rounds of thread_no at a time
+            seconds = int(math.ceil(batch_no / float(thread_no))) * (overhead + per_ticker * batch_size)
+
+            if best_seconds is None or seconds < best_seconds * (1 - 1e-9):
+                best_batch_no = batch_no
+                best_seconds = seconds
+
+            # beyond this, every thread has at most one ticker, so it can't get any faster
+            if batch_size == 1: break
+
+        # spread the tickers evenly (batch sizes differ by at most one)
+        batches = []
+        start = 0
+
+        for i in range(0, best_batch_no):
+            finish = start + ticker_no // best_batch_no + (1 if i < ticker_no % best_batch_no else 0)
+
+            batches.append((start, finish))
+            start = finish
+
+        return batches
+
+if __name__ == '__main__':
+    # see pythalesians.market.loaders.lighttimeseriesfactory, which uses TickerBatchPlanner
+    pass
@@ -0,0 +1,299 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+TimeSeriesCache
+
+In memory cache of time series (DataFrames), limited to a budget of bytes. When the budget is exceeded, the least
+recently used (LRU) or least frequently used (LFU) time series are evicted, optionally spilling to disk (using
+TimeSeriesIO), so that they can be read back later without going to the data vendor.
+
+Also records the date range covered by each ticker.field of a cached time series, so that callers can work out which
+dates are missing and only download those.
+
+Keeps counts of hits (memory and disk), misses and evictions.
+
+"""
+
+import collections
+import hashlib
+import os
+import threading
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.market.loaders.timeseriesio import TimeSeriesIO
+
+class TimeSeriesCache:
+
+    # spilled time series are named with this prefix, so that only they are deleted when flushing (the disk folder
+    # might hold other HDF5 files)
+    disk_prefix = 'timeseriescache_'
+
+    def __init__(self, max_bytes = 1024 * 1024 * 1024, eviction = 'lru', disk_folder = None):
+        """
+        __init__ - Creates an empty cache
+
+        Parameters
+        ----------
+        max_bytes : int
+            memory budget for the time series (None for no limit)
+        eviction : str
+            'lru' (least recently used) or 'lfu' (least frequently used)
+        disk_folder : str (optional)
+            folder to spill evicted time series into (if None, evicted time series are dropped)
+        """
+        self.logger = LoggerManager().getLogger(__name__)
+
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.disk_folder = disk_folder
+
+        self._lock = threading.RLock()
+
+        self.flush()
+        self.reset_stats()
+
+    def get(self, key):
+        """
+        get - Gets a time series from memory, or failing that, from disk (which is then moved back into memory)
+
+        Parameters
+        ----------
+        key : str
+            key of the time series
+
+        Returns
+        -------
+        DataFrame (None if not in cache)
+        """
+        with self._lock:
+            if key in self._items:
+                # move to the most recently used end
+                data_frame = self._items.pop(key)
+                self._items[key] = data_frame
+
+                self._use_count[key] = self._use_count[key] + 1
+                self._stats['hits'] = self._stats['hits'] + 1
+
+                return data_frame
+
+        data_frame = self._read_disk(key)
+
+        with self._lock:
+            if data_frame is None:
+                self._stats['misses'] = self._stats['misses'] + 1
+
+                return None
+
+            self._stats['disk_hits'] = self._stats['disk_hits'] + 1
+
+        # already on disk, so no need to write it again if it is evicted
+        self._put_memory(key, data_frame, on_disk = True)
+
+        return data_frame
+
+    def put(self, key, data_frame, coverage = None):
+        """
+        put - Adds a time series to the cache (replacing any older version)
+
+        Parameters
+        ----------
+        key : str
+            key of the time series
+        data_frame : DataFrame
+            time series to cache
+        coverage : dict (optional)
+            ticker.field => (start date, finish date) which have been downloaded for that column
+        """
+        if data_frame is None: return
+
+        with self._lock:
+            if coverage is None:
+                self._coverage.pop(key, None)
+            else:
+                self._coverage[key] = dict(coverage)
+
+        self._remove_disk(key)
+        self._put_memory(key, data_frame, on_disk = False)
+
+    def get_coverage(self, key):
+        """
+        get_coverage - Gets the date range downloaded for each ticker.field of a cached time series
+
+        Parameters
+        ----------
+        key : str
+            key of the time series
+
+        Returns
+        -------
+        dict (ticker.field => (start date, finish date))
+        """
+        with self._lock:
+            return dict(self._coverage.get(key, {}))
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._items: return True
+
+        return self.disk_folder is not None and os.path.isfile(self._get_disk_path(key))
+
+    def __len__(self):
+        return len(self._items)
+
+    def flush(self, disk = False):
+        """
+        flush - Empties the cache in memory (and on disk if specified)
+
+        Parameters
+        ----------
+        disk : bool
+            also delete time series spilled to disk (other files in disk_folder are left alone)
+        """
+        with self._lock:
+            self._items = collections.OrderedDict()
+            self._sizes = {}
+            self._use_count = {}
+            self._on_disk = set()
+            self._coverage = {}
+            self._bytes = 0
+
+        if disk and self.disk_folder is not None and os.path.isdir(self.disk_folder):
+            for f in os.listdir(self.disk_folder):
+                if f.startswith(self.disk_prefix) and f.endswith('.h5'): os.remove(os.path.join(self.disk_folder, f))
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'hits' : 0, 'disk_hits' : 0, 'misses' : 0, 'evictions' : 0, 'disk_writes' : 0}
+
+    def get_stats(self):
+        """
+        get_stats - Gets counts of hits, misses and evictions, as well as the memory used
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['items'] = len(self._items)
+            stats['bytes'] = self._bytes
+
+        return stats
+
+    def get_size(self, data_frame):
+        try:
+            return int(data_frame.memory_usage(index = True, deep = True).sum())
+        except:
+            # eg. for Series (or anything else which isn't a DataFrame)
+            try:
+                return int(data_frame.memory_usage(index = True, deep = True))
+            except:
+                return 0
+
+    def _put_memory(self, key, data_frame, on_disk):
+        size = self.get_size(data_frame)
+
+        evicted = []
+
+        with self._lock:
+            self._discard(key)
+
+            if on_disk: self._on_disk.add(key)
+
+            # too large to ever fit in memory
+            if self.max_bytes is not None and size > self.max_bytes:
+                evicted.append((key, data_frame, on_disk))
+            else:
+                self._items[key] = data_frame
+                self._sizes[key] = size
+                self._use_count[key] = 1
+                self._bytes = self._bytes + size
+
+                while self.max_bytes is not None and self._bytes > self.max_bytes:
+                    victim = self._get_victim()
+                    victim_on_disk = victim in self._on_disk
+
+                    evicted.append((victim, self._items[victim], victim_on_disk))
+                    self._discard(victim)
+
+            self._stats['evictions'] = self._stats['evictions'] + len(evicted)
+
+            # without a disk tier, evicted time series are gone (so they don't cover any dates)
+            if self.disk_folder is None:
+                for victim, victim_data_frame, victim_on_disk in evicted: self._coverage.pop(victim, None)
+
+        # do the (slow) disk writes outside the lock
+        for victim, victim_data_frame, victim_on_disk in evicted:
+            if not victim_on_disk: self._write_disk(victim, victim_data_frame)
+
+    def _get_victim(self):
+        # OrderedDict is kept from least to most recently used
+        if self.eviction == 'lfu':
+            return min(self._items, key = lambda k: self._use_count[k])
+
+        return next(iter(self._items))
+
+    def _discard(self, key):
+        if key in self._items:
+            self._bytes = self._bytes - self._sizes[key]
+
+            del self._items[key]
+            del self._sizes[key]
+            del self._use_count[key]
+
+        self._on_disk.discard(key)
+
+    ### disk tier
+    def _get_disk_path(self, key):
+        # keys can contain characters which aren't allowed in file names
+        return os.path.join(self.disk_folder, self.disk_prefix + hashlib.md5(key.encode('utf-8')).hexdigest() + '.h5')
+
+    def _write_disk(self, key, data_frame):
+        if self.disk_folder is None: return
+
+        try:
+            if not os.path.exists(self.disk_folder): os.makedirs(self.disk_folder)
+
+            TimeSeriesIO().write_time_series_cache_to_disk(self._get_disk_path(key), data_frame)
+
+            with self._lock:
+                self._stats['disk_writes'] = self._stats['disk_writes'] + 1
+        except:
+            self.logger.warning("Couldn't spill " + key + " to disk")
+
+    def _read_disk(self, key):
+        if self.disk_folder is None: return None
+
+        path = self._get_disk_path(key)
+
+        if not os.path.isfile(path): return None
+
+        try:
+            return TimeSeriesIO().read_time_series_cache_from_disk(path)
+        except:
+            self.logger.warning("Couldn't read " + key + " from disk")
+
+            return None
+
+    def _remove_disk(self, key):
+        if self.disk_folder is None: return
+
+        try:
+            os.remove(self._get_disk_path(key))
+        except: pass
+
+if __name__ == '__main__':
+    # see pythalesians.market.loaders.lighttimeseriesfactory, which uses TimeSeriesCache
+    pass
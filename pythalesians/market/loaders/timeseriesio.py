@@ -15,20 +15,34 @@ __author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
 """
 TimeSeriesIO
 
-Write and reads time series data to disk in various formats, CSV and HDF5 format. (planning to add other interfaces too).
+Write and reads time series data to disk in various formats, CSV, HDF5, bcolz, Parquet and memory mapped float32 format.
+(planning to add other interfaces too).
 
 """
 
+import numpy
 import pandas
 import codecs
 import datetime
+import json
 from dateutil.parser import parse
 import shutil
+import warnings
+
+try:
+    from urllib.parse import quote
+except:
+    from urllib import quote
 
 try:
     import bcolz
 except: pass
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except: pass
+
 from openpyxl import load_workbook
 import os.path
 
@@ -138,7 +152,8 @@ class TimeSeriesIO:
                             postfix = postfix, intraday_tz = intraday_tz, excel_sheet = excel_sheet)
 
     ### functions to handle HDF5 on disk
-    def write_time_series_cache_to_disk(self, fname, data_frame, use_bcolz = False):
+    def write_time_series_cache_to_disk(self, fname, data_frame, use_bcolz = False, use_table = False,
+                                        use_parquet = False, use_mmap = False):
         """
         write_time_series_cache_to_disk - writes Pandas data frame to disk as HDF5 format or bcolz format
 
@@ -148,9 +163,20 @@ class TimeSeriesIO:
             path of file
         data_frame : DataFrame
             data frame to be written to disk
+        use_table : bool
+            write HDF5 in table format, with an index on the dates, so that read_time_series_cache_from_disk can
+            read just a date range (slower to write than the default fixed format)
+        use_parquet : bool
+            write in Parquet format instead (see write_time_series_cache_to_parquet)
+        use_mmap : bool
+            write in memory mapped float32 format instead (see write_time_series_cache_to_mmap)
         """
 
-        if (use_bcolz):
+        if (use_mmap):
+            self.write_time_series_cache_to_mmap(fname, data_frame)
+        elif (use_parquet):
+            self.write_time_series_cache_to_parquet(fname, data_frame)
+        elif (use_bcolz):
             # convert invalid characters to substitutes (which Bcolz can't deal with)
             data_frame.columns = self.find_replace_chars(data_frame.columns, _invalid_chars, _replace_chars)
             data_frame.columns = ['A_' + x for x in data_frame.columns]
@@ -175,7 +201,22 @@ class TimeSeriesIO:
             if ('intraday' in fname):
                 data_frame = data_frame.astype('float32')
 
-            store['data'] = data_frame
+            if use_table:
+                # dates are found by binary search when reading, so must be in order
+                if not(data_frame.index.is_monotonic_increasing): data_frame = data_frame.sort_index()
+
+                # each column is stored separately (data_columns), so reads of a few columns don't touch the others
+                # tickers like 'EURUSD.close' aren't natural names for PyTables, which warns about each of them
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+
+                    store.put('data', data_frame, format = 'table', index = False, data_columns = True)
+
+                # completely sorted index, so date range queries only touch the rows they need
+                store.create_table_index('data', columns = ['index'], optlevel = 9, kind = 'full')
+            else:
+                store['data'] = data_frame
+
             store.close()
 
             # delete the old copy
@@ -186,6 +227,102 @@ class TimeSeriesIO:
             # once written to disk rename
             os.rename(h5_filename_temp, h5_filename)
 
+    def append_time_series_cache_to_disk(self, fname, data_frame, compact_every = 50):
+        """
+        append_time_series_cache_to_disk - Adds the rows of a DataFrame after the last date already stored to an HDF5
+        table (written by write_time_series_cache_to_disk with use_table = True), without rewriting the file. Every
+        compact_every appends, the file is compacted (rewritten to a temporary file and renamed). If the file doesn't
+        exist, or is in fixed format, the whole file is written in table format.
+
+        Parameters
+        ----------
+        fname : str
+            path of file
+        data_frame : DataFrame
+            time series, which must have the same columns as the stored time series
+        compact_every : int
+            number of appends between compactions (None to never compact)
+        """
+
+        h5_filename = self.get_h5_filename(fname)
+
+        if ('intraday' in fname):
+            data_frame = data_frame.astype('float32')
+
+        if not(os.path.isfile(h5_filename)):
+            self.write_time_series_cache_to_disk(fname, data_frame, use_table = True)
+
+            return
+
+        store = pandas.HDFStore(h5_filename, complib="blosc", complevel=9)
+
+        try:
+            storer = store.get_storer('data')
+
+            if storer.is_table:
+                row_no = storer.nrows
+
+                # no rows, so only read the columns
+                stored = store.select('data', start = 0, stop = 0)
+
+                if row_no > 0: stored = store.select('data', start = row_no - 1, stop = row_no)
+            else:
+                stored = store.select('data')
+        finally:
+            store.close()
+
+        if set(stored.columns) != set(data_frame.columns):
+            raise Exception("Columns to append to " + h5_filename + " don't match those stored: "
+                            + str(list(data_frame.columns)) + " vs " + str(list(stored.columns)))
+
+        # only the rows after the last date already stored
+        data_frame = data_frame[list(stored.columns)].sort_index()
+
+        if len(stored.index) > 0:
+            data_frame = data_frame.iloc[data_frame.index.searchsorted(stored.index[-1], side = 'right'):]
+
+        if not(storer.is_table):
+            # fixed format can't be appended to, so convert it to a table
+            self.write_time_series_cache_to_disk(fname, pandas.concat([stored, data_frame]), use_table = True)
+
+            return
+
+        if len(data_frame.index) == 0: return
+
+        store = pandas.HDFStore(h5_filename, complib="blosc", complevel=9)
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+
+                store.append('data', data_frame.astype(stored.dtypes.to_dict()))
+
+            # count appends since the file was last written whole
+            attrs = store.get_storer('data').attrs
+
+            append_no = getattr(attrs, 'append_no', 0) + 1
+            attrs.append_no = append_no
+        finally:
+            store.close()
+
+        if compact_every is not None and append_no >= compact_every:
+            self.compact_time_series_cache_on_disk(fname)
+
+    def compact_time_series_cache_on_disk(self, fname):
+        """
+        compact_time_series_cache_on_disk - Rewrites an HDF5 table after many appends (which leave it fragmented), to
+        a temporary file which is then renamed
+
+        Parameters
+        ----------
+        fname : str
+            path of file
+        """
+
+        self.logger.info("Compacting " + self.get_h5_filename(fname))
+
+        self.write_time_series_cache_to_disk(fname, self.read_time_series_cache_from_disk(fname), use_table = True)
+
     def get_h5_filename(self, fname):
         """
         get_h5_filename - Strips h5 off filename returning first portion of filename
@@ -204,6 +341,42 @@ class TimeSeriesIO:
 
         return fname + ".h5"
 
+    def get_parquet_filename(self, fname):
+        """
+        get_parquet_filename - Adds .parquet to the filename (if it isn't there already)
+
+        Parameters
+        ----------
+        fname : str
+            filename
+
+        Returns
+        -------
+        str
+        """
+        if fname[-8:] == '.parquet':
+            return fname
+
+        return fname + ".parquet"
+
+    def get_mmap_filename(self, fname):
+        """
+        get_mmap_filename - Adds .mmap to the filename (if it isn't there already)
+
+        Parameters
+        ----------
+        fname : str
+            filename
+
+        Returns
+        -------
+        str
+        """
+        if fname[-5:] == '.mmap':
+            return fname
+
+        return fname + ".mmap"
+
     def get_bcolz_filename(self, fname):
         """
         get_bcolz_filename - Strips h5 off filename returning first portion of filename
@@ -261,7 +434,8 @@ class TimeSeriesIO:
         store_export.put('df_for_r', data_frame32, data_columns=cols)
         store_export.close()
 
-    def read_time_series_cache_from_disk(self, fname, use_bcolz = False):
+    def read_time_series_cache_from_disk(self, fname, use_bcolz = False, start_date = None, finish_date = None,
+                                         columns = None, use_parquet = False, use_mmap = False):
         """
         read_time_series_cache_from_disk - Reads time series cache from disk in either HDF5 or bcolz
 
@@ -269,13 +443,29 @@ class TimeSeriesIO:
         ----------
         fname : str
             file to be read from
+        start_date : DateTime (optional)
+            first date to read
+        finish_date : DateTime (optional)
+            last date to read
+        columns : list(str) (optional)
+            columns to read
+        use_parquet : bool
+            read Parquet format (see read_time_series_cache_from_parquet)
+        use_mmap : bool
+            read memory mapped float32 format (see read_time_series_cache_from_mmap)
 
         Returns
         -------
         DataFrame
         """
 
-        if (use_bcolz):
+        if (use_mmap):
+            return self.read_time_series_cache_from_mmap(fname, start_date = start_date, finish_date = finish_date,
+                                                         columns = columns)
+        elif (use_parquet):
+            return self.read_time_series_cache_from_parquet(fname, start_date = start_date, finish_date = finish_date,
+                                                            columns = columns)
+        elif (use_bcolz):
             try:
                 name = self.get_bcolz_filename(fname)
                 zlens = bcolz.open(rootdir=name)
@@ -295,17 +485,374 @@ class TimeSeriesIO:
 
         elif os.path.isfile(self.get_h5_filename(fname)):
             store = pandas.HDFStore(self.get_h5_filename(fname))
-            data_frame = store.select("data")
+
+            try:
+                if store.get_storer('data').is_table:
+                    # the date range is looked up in the index on the dates, and only the columns we want are read
+                    data_frame = store.select("data", where = self.create_table_where(store, start_date, finish_date),
+                                              columns = columns)
+                else:
+                    # fixed format can only be read whole
+                    data_frame = self.filter_date_columns(store.select("data"), start_date, finish_date, columns)
+            finally:
+                store.close()
 
             if ('intraday' in fname):
                 data_frame = data_frame.astype('float32')
 
-            store.close()
-
             return data_frame
 
         return None
 
+    ### functions to handle Parquet on disk
+    def write_time_series_cache_to_parquet(self, fname, data_frame, row_group_size = 65536):
+        """
+        write_time_series_cache_to_parquet - Writes a DataFrame to disk as a folder of Parquet files, one for each
+        ticker and year (eg. EURUSD/2015.parquet has all the EURUSD.* columns for 2015), keeping the column names
+        as they are. A JSON header lists the columns, years and time zone.
+
+        Parameters
+        ----------
+        fname : str
+            path of the folder (.parquet is added)
+        data_frame : DataFrame
+            time series to write (with a DatetimeIndex)
+        row_group_size : int
+            rows in each row group (date range reads skip row groups outside the range)
+        """
+
+        parquet_folder = self.get_parquet_filename(fname)
+        parquet_folder_temp = parquet_folder + ".temp"
+
+        if ('intraday' in fname):
+            data_frame = data_frame.astype('float32')
+
+        index_name = data_frame.index.name
+
+        if index_name is None:
+            index_name = 'Date'
+            data_frame = data_frame.rename_axis(index_name)
+
+        # group columns by ticker (everything before the first '.')
+        tickers = []
+        ticker_columns = {}
+
+        for col in data_frame.columns:
+            ticker = col.split('.')[0]
+
+            if ticker not in ticker_columns:
+                tickers.append(ticker)
+                ticker_columns[ticker] = []
+
+            ticker_columns[ticker].append(col)
+
+        years = sorted(set(data_frame.index.year))
+
+        shutil.rmtree(parquet_folder_temp, ignore_errors = True)
+
+        for ticker in tickers:
+            # escape characters which aren't allowed in file names (eg. /)
+            ticker_folder = os.path.join(parquet_folder_temp, quote(ticker, safe = ''))
+            os.makedirs(ticker_folder)
+
+            data_frame_ticker = data_frame[ticker_columns[ticker]]
+
+            for year in years:
+                data_frame_year = data_frame_ticker[data_frame_ticker.index.year == year]
+
+                table = pyarrow.Table.from_pandas(data_frame_year, preserve_index = True)
+
+                # prices compress much better with their bytes split into streams, and dates as differences
+                column_encoding = dict((c, 'BYTE_STREAM_SPLIT') for c in ticker_columns[ticker]
+                                       if data_frame_year[c].dtype.kind == 'f')
+                column_encoding[index_name] = 'DELTA_BINARY_PACKED'
+
+                pyarrow.parquet.write_table(table, os.path.join(ticker_folder, str(year) + '.parquet'),
+                                            row_group_size = row_group_size, compression = 'zstd',
+                                            use_dictionary = False, column_encoding = column_encoding)
+
+        header = {'columns' : list(data_frame.columns), 'tickers' : [quote(t, safe = '') for t in tickers],
+                  'years' : [int(y) for y in years], 'index' : index_name,
+                  'tz' : None if data_frame.index.tz is None else str(data_frame.index.tz)}
+
+        if not os.path.exists(parquet_folder_temp): os.makedirs(parquet_folder_temp)
+
+        with open(os.path.join(parquet_folder_temp, 'header.json'), 'w') as f:
+            json.dump(header, f)
+
+        # once written to disk rename
+        shutil.rmtree(parquet_folder, ignore_errors = True)
+        os.rename(parquet_folder_temp, parquet_folder)
+
+    def read_time_series_cache_from_parquet(self, fname, start_date = None, finish_date = None, columns = None):
+        """
+        read_time_series_cache_from_parquet - Reads a DataFrame written by write_time_series_cache_to_parquet. Only
+        the files for the tickers of the columns and years in the date range are opened (memory mapped), and within
+        them only the row groups overlapping the date range
+
+        Parameters
+        ----------
+        fname : str
+            path of the folder
+        start_date : DateTime (optional)
+            first date to read
+        finish_date : DateTime (optional)
+            last date to read
+        columns : list(str) (optional)
+            columns to read
+
+        Returns
+        -------
+        DataFrame
+        """
+
+        parquet_folder = self.get_parquet_filename(fname)
+
+        try:
+            with open(os.path.join(parquet_folder, 'header.json'), 'r') as f:
+                header = json.load(f)
+        except:
+            return None
+
+        if columns is None: columns = header['columns']
+
+        index_name = header['index']
+
+        filters = []
+        years = header['years']
+
+        # naive dates are assumed to be in the same time zone as the stored dates
+        if start_date is not None:
+            start_date = self.localize_date(start_date, header['tz'])
+            filters.append((index_name, '>=', start_date))
+            years = [y for y in years if y >= start_date.year]
+
+        if finish_date is not None:
+            finish_date = self.localize_date(finish_date, header['tz'])
+            filters.append((index_name, '<=', finish_date))
+            years = [y for y in years if y <= finish_date.year]
+
+        if len(filters) == 0: filters = None
+
+        tickers = []
+        ticker_columns = {}
+
+        for col in columns:
+            ticker = quote(col.split('.')[0], safe = '')
+
+            if ticker not in ticker_columns:
+                tickers.append(ticker)
+                ticker_columns[ticker] = []
+
+            ticker_columns[ticker].append(col)
+
+        data_frame_list = []
+
+        for ticker in tickers:
+            tables = []
+
+            for year in years:
+                path = os.path.join(parquet_folder, ticker, str(year) + '.parquet')
+
+                if os.path.isfile(path):
+                    tables.append(pyarrow.parquet.read_table(path, columns = ticker_columns[ticker] + [index_name],
+                                                             filters = filters, memory_map = True))
+
+            if len(tables) > 0:
+                data_frame_list.append(pyarrow.concat_tables(tables).to_pandas())
+
+        if len(data_frame_list) == 0: return None
+
+        # every ticker was written with the same dates, so no need to align them
+        if len(data_frame_list) == 1:
+            data_frame = data_frame_list[0]
+        else:
+            data_frame = pandas.concat(data_frame_list, axis = 1)
+
+        if ('intraday' in fname):
+            data_frame = data_frame.astype('float32')
+
+        return data_frame[columns]
+
+    ### functions to handle memory mapped float32 on disk
+    def write_time_series_cache_to_mmap(self, fname, data_frame):
+        """
+        write_time_series_cache_to_mmap - Writes a DataFrame to disk uncompressed, as a folder with the dates (int64
+        nanoseconds since 1970 in UTC) in index.i8, each column (as float32) in its own file and a JSON header, so that
+        it can be memory mapped by read_time_series_cache_from_mmap
+
+        Parameters
+        ----------
+        fname : str
+            path of the folder (.mmap is added)
+        data_frame : DataFrame
+            time series to write (with a DatetimeIndex)
+        """
+
+        mmap_folder = self.get_mmap_filename(fname)
+        mmap_folder_temp = mmap_folder + ".temp"
+
+        shutil.rmtree(mmap_folder_temp, ignore_errors = True)
+        os.makedirs(mmap_folder_temp)
+
+        index = data_frame.index
+
+        if hasattr(index, 'as_unit'): index = index.as_unit('ns')
+
+        # asi8 is always in UTC
+        numpy.asarray(index.asi8, dtype = '<i8').tofile(os.path.join(mmap_folder_temp, 'index.i8'))
+
+        # one column at a time, so we never need a float32 copy of the whole DataFrame
+        for i in range(0, len(data_frame.columns)):
+            numpy.ascontiguousarray(data_frame.iloc[:, i].values, dtype = '<f4').tofile(
+                os.path.join(mmap_folder_temp, 'column' + str(i) + '.f4'))
+
+        header = {'version' : 1, 'rows' : len(index), 'columns' : [str(c) for c in data_frame.columns],
+                  'index' : index.name, 'tz' : None if index.tz is None else str(index.tz)}
+
+        with open(os.path.join(mmap_folder_temp, 'header.json'), 'w') as f:
+            json.dump(header, f)
+
+        # once written to disk rename
+        shutil.rmtree(mmap_folder, ignore_errors = True)
+        os.rename(mmap_folder_temp, mmap_folder)
+
+    def read_time_series_cache_from_mmap(self, fname, start_date = None, finish_date = None, columns = None):
+        """
+        read_time_series_cache_from_mmap - Opens a DataFrame written by write_time_series_cache_to_mmap, as a view
+        on the memory mapped files (nothing is copied, so processes opening the same files share the OS page cache,
+        and only the pages which are used are read from disk). The DataFrame is read only.
+
+        Parameters
+        ----------
+        fname : str
+            path of the folder
+        start_date : DateTime (optional)
+            first date
+        finish_date : DateTime (optional)
+            last date
+        columns : list(str) (optional)
+            columns to read
+
+        Returns
+        -------
+        DataFrame
+        """
+
+        mmap_folder = self.get_mmap_filename(fname)
+
+        try:
+            with open(os.path.join(mmap_folder, 'header.json'), 'r') as f:
+                header = json.load(f)
+        except:
+            return None
+
+        if columns is None: columns = header['columns']
+
+        row_no = header['rows']
+
+        # can't memory map empty files
+        if row_no == 0:
+            index = pandas.DatetimeIndex([], name = header['index'])
+
+            if header['tz'] is not None: index = index.tz_localize(header['tz'])
+
+            return pandas.DataFrame(index = index, columns = columns, dtype = numpy.float32)
+
+        dates = numpy.memmap(os.path.join(mmap_folder, 'index.i8'), dtype = '<i8', mode = 'r', shape = (row_no,))
+
+        start = 0
+        stop = row_no
+
+        # naive dates are assumed to be in the same time zone as the stored dates
+        if start_date is not None:
+            start = dates.searchsorted(self.localize_date(start_date, header['tz']).value, side = 'left')
+
+        if finish_date is not None:
+            stop = dates.searchsorted(self.localize_date(finish_date, header['tz']).value, side = 'right')
+
+        stop = max(start, stop)
+
+        index = self.create_date_index(dates[start:stop], header['tz'], header['index'])
+
+        data = {}
+
+        for col in columns:
+            i = header['columns'].index(col)
+
+            data[col] = numpy.memmap(os.path.join(mmap_folder, 'column' + str(i) + '.f4'), dtype = '<f4', mode = 'r',
+                                     shape = (row_no,))[start:stop]
+
+        # copy = False keeps one block per column, each a view on its file
+        return pandas.DataFrame(data, index = index, columns = columns, copy = False)
+
+    def create_date_index(self, dates, tz, name):
+        # dates are nanoseconds in UTC
+        dates = dates.view('M8[ns]')
+
+        if tz is None: return pandas.DatetimeIndex(dates, name = name, copy = False)
+
+        try:
+            # tz_localize would copy the dates
+            from pandas.core.arrays import DatetimeArray
+
+            return pandas.DatetimeIndex(DatetimeArray._simple_new(dates, dtype = pandas.DatetimeTZDtype('ns', tz)),
+                                        name = name, copy = False)
+        except:
+            return pandas.DatetimeIndex(dates, name = name).tz_localize('UTC').tz_convert(tz)
+
+    def localize_date(self, date, tz):
+        # gives date the time zone tz (or removes it if tz is None)
+        date = pandas.Timestamp(date)
+
+        if tz is not None and date.tz is None: return date.tz_localize(tz)
+        if tz is None and date.tz is not None: return date.tz_convert(None)
+
+        return date
+
+    def create_table_where(self, store, start_date, finish_date):
+        """
+        create_table_where - Creates a query for the rows of an HDF5 table between two dates (inclusive), which uses
+        the index on the dates created by write_time_series_cache_to_disk
+
+        Parameters
+        ----------
+        store : HDFStore
+            open store with the table in 'data'
+        start_date : DateTime (optional)
+            first date
+        finish_date : DateTime (optional)
+            last date
+
+        Returns
+        -------
+        list(str) - conditions (None for all the rows)
+        """
+
+        where = []
+
+        # naive dates are assumed to be in the same time zone as the stored dates (normally UTC)
+        tz = store.get_storer('data').info.get('index', {}).get('tz')
+
+        if start_date is not None:
+            where.append("index >= '" + self.localize_date(start_date, tz).isoformat() + "'")
+
+        if finish_date is not None:
+            where.append("index <= '" + self.localize_date(finish_date, tz).isoformat() + "'")
+
+        if len(where) == 0: return None
+
+        return where
+
+    def filter_date_columns(self, data_frame, start_date, finish_date, columns):
+        if columns is not None:
+            data_frame = data_frame[columns]
+
+        if start_date is not None or finish_date is not None:
+            data_frame = data_frame.loc[start_date:finish_date]
+
+        return data_frame
+
     ### functions for CSV reading and writing
     def write_time_series_to_csv(self, csv_path, data_frame):
         data_frame.to_csv(csv_path)
@@ -15,6 +15,7 @@ class TimeSeriesRequest:
     # freq_mult (eg. 1)
     # freq
     # gran_freq (minute, daily, hourly, daily, weekly, monthly, yearly)
+    # bar_freq (optional) eg. 1min - for tick requests, aggregate ticks into bars of this frequency as they are downloaded
     # fields (can be list)
     # vendor_tickers (optional)
     # vendor_fields (optional)
@@ -26,7 +27,7 @@ class TimeSeriesRequest:
                  gran_freq = None, cut = None,
                  fields = None, cache_algo = None,
                  vendor_tickers = None, vendor_fields = None,
-                 environment = "backtest", trade_side = 'trade'
+                 environment = "backtest", trade_side = 'trade', bar_freq = None
                  ):
 
         self.logger = LoggerManager().getLogger(__name__)
@@ -41,6 +42,7 @@ class TimeSeriesRequest:
         if gran_freq is not None: self.gran_freq = gran_freq
         if freq_mult is not None: self.freq_mult = freq_mult
         if freq is not None: self.freq = freq
+        if bar_freq is not None: self.bar_freq = bar_freq
         if cut is not None: self.cut = cut
         if fields is not None: self.fields = fields
         if cache_algo is not None: self.cache_algo = cache_algo
@@ -160,6 +162,14 @@ class TimeSeriesRequest:
 
         self.__gran_freq = gran_freq
 
+    @property
+    def bar_freq(self):
+        return self.__bar_freq
+
+    @bar_freq.setter
+    def bar_freq(self, bar_freq):
+        self.__bar_freq = bar_freq
+
     @property
     def freq_mult(self):
         return self.__freq_mult
@@ -0,0 +1,235 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+CompactTicks
+
+Holds bid/ask tick data for a single symbol in a compact form, close to how brokers such as Dukascopy send it:
+- prices as int32 ticks (with a scale per symbol, eg. 100000 for EURUSD, 1000 for USDJPY)
+- times as int32 millisecond offsets from the start of each chunk (eg. each hour)
+- volumes as float32
+
+Uses roughly half the memory of the equivalent DataFrame (20 bytes per tick rather than 40). Only converted into a
+DataFrame when needed (and that is cached), whilst spreads and tick counts can be calculated directly on the arrays.
+
+"""
+
+import numpy
+import pandas
+
+class CompactTicks:
+
+    price_fields = ['bid', 'ask']
+    volume_fields = ['bidv', 'askv']
+
+    def __init__(self, symbol, scale, chunk_epochs, chunk_lengths, offsets, bid, ask, bidv, askv):
+        """
+        __init__ - Creates a tick container from arrays (see also from_records and concat)
+
+        Parameters
+        ----------
+        symbol : str
+            ticker of the ticks
+        scale : float
+            number of price ticks in one unit of price (eg. 100000.0 for EURUSD)
+        chunk_epochs : numpy.ndarray (int64)
+            start of each chunk in milliseconds since 1970
+        chunk_lengths : numpy.ndarray (int64)
+            number of ticks in each chunk
+        offsets : numpy.ndarray (int32)
+            millisecond offset of each tick from the start of its chunk
+        bid, ask : numpy.ndarray (int32)
+            prices in ticks
+        bidv, askv : numpy.ndarray (float32)
+            volumes
+        """
+        self.symbol = symbol
+        self.scale = scale
+
+        self.chunk_epochs = numpy.asarray(chunk_epochs, dtype = numpy.int64)
+        self.chunk_lengths = numpy.asarray(chunk_lengths, dtype = numpy.int64)
+
+        self.offsets = numpy.asarray(offsets, dtype = numpy.int32)
+        self.bid = numpy.asarray(bid, dtype = numpy.int32)
+        self.ask = numpy.asarray(ask, dtype = numpy.int32)
+        self.bidv = numpy.asarray(bidv, dtype = numpy.float32)
+        self.askv = numpy.asarray(askv, dtype = numpy.float32)
+
+        self._data_frame = None
+
+    @staticmethod
+    def from_records(records, symbol, scale, epoch):
+        """
+        from_records - Creates a tick container from one chunk of records (with fields temp, bid, ask, bidv, askv as
+        in a Dukascopy bi5 file)
+
+        Parameters
+        ----------
+        records : numpy.ndarray
+            structured array of ticks (temp is the millisecond offset from epoch)
+        symbol : str
+            ticker of the ticks
+        scale : float
+            number of price ticks in one unit of price
+        epoch : DateTime
+            start of the chunk
+
+        Returns
+        -------
+        CompactTicks
+        """
+        epoch_ms = numpy.datetime64(pandas.Timestamp(epoch).tz_localize(None), 'ms').astype(numpy.int64)
+
+        return CompactTicks(symbol, scale, [epoch_ms], [len(records)],
+                            records['temp'], records['bid'], records['ask'], records['bidv'], records['askv'])
+
+    @staticmethod
+    def concat(ticks_list):
+        """
+        concat - Joins several tick containers (of the same symbol) in order, ignoring any None
+
+        Parameters
+        ----------
+        ticks_list : list(CompactTicks)
+            containers to join
+
+        Returns
+        -------
+        CompactTicks
+        """
+        ticks_list = [x for x in ticks_list if x is not None]
+
+        if len(ticks_list) == 0: return None
+
+        first = ticks_list[0]
+
+        return CompactTicks(first.symbol, first.scale,
+                            numpy.concatenate([x.chunk_epochs for x in ticks_list]),
+                            numpy.concatenate([x.chunk_lengths for x in ticks_list]),
+                            numpy.concatenate([x.offsets for x in ticks_list]),
+                            numpy.concatenate([x.bid for x in ticks_list]),
+                            numpy.concatenate([x.ask for x in ticks_list]),
+                            numpy.concatenate([x.bidv for x in ticks_list]),
+                            numpy.concatenate([x.askv for x in ticks_list]))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def nbytes(self):
+        """
+        nbytes - Memory used by the tick arrays (in bytes)
+        """
+        return sum(x.nbytes for x in [self.chunk_epochs, self.chunk_lengths, self.offsets,
+                                      self.bid, self.ask, self.bidv, self.askv])
+
+    def get_epoch_ms(self):
+        """
+        get_epoch_ms - Gets the time of each tick in milliseconds since 1970
+
+        Returns
+        -------
+        numpy.ndarray (int64)
+        """
+        return numpy.repeat(self.chunk_epochs, self.chunk_lengths) + self.offsets
+
+    def get_index(self):
+        """
+        get_index - Gets the time of each tick
+
+        Returns
+        -------
+        DatetimeIndex
+        """
+        index = pandas.DatetimeIndex(self.get_epoch_ms().astype('datetime64[ms]'))
+        index.name = 'Date'
+
+        return index
+
+    def get_price(self, field):
+        """
+        get_price - Gets bid or ask prices, scaled into floating point
+
+        Parameters
+        ----------
+        field : str
+            'bid' or 'ask'
+
+        Returns
+        -------
+        numpy.ndarray (float64)
+        """
+        return getattr(self, field) / self.scale
+
+    def get_spread(self):
+        """
+        get_spread - Gets the spread between ask and bid of each tick (subtracted in integer ticks, so no rounding
+        error, before scaling)
+
+        Returns
+        -------
+        numpy.ndarray (float64)
+        """
+        return (self.ask.astype(numpy.int64) - self.bid) / self.scale
+
+    def get_tick_count(self, freq):
+        """
+        get_tick_count - Counts the ticks in each bar (bars with no ticks are left out)
+
+        Parameters
+        ----------
+        freq : str
+            fixed bar frequency (eg. '1h')
+
+        Returns
+        -------
+        Series
+        """
+        bar_ms = pandas.tseries.frequencies.to_offset(freq).nanos // 1000000
+
+        bars = self.get_epoch_ms() // bar_ms
+
+        # ticks are sorted, so each bar is a contiguous block
+        starts = numpy.flatnonzero(numpy.concatenate(([True], bars[1:] != bars[:-1]))) if len(bars) > 0 \
+            else numpy.array([], dtype = numpy.int64)
+
+        counts = numpy.diff(numpy.append(starts, len(bars)))
+
+        index = pandas.DatetimeIndex((bars[starts] * bar_ms).astype('datetime64[ms]'))
+        index.name = 'Date'
+
+        return pandas.Series(counts, index = index)
+
+    def to_data_frame(self):
+        """
+        to_data_frame - Converts the ticks into a DataFrame with columns bid, ask, bidv, askv (cached, so repeated
+        calls are cheap)
+
+        Returns
+        -------
+        DataFrame
+        """
+        if self._data_frame is None:
+            self._data_frame = pandas.DataFrame({'bid' : self.get_price('bid'),
+                                                 'ask' : self.get_price('ask'),
+                                                 'bidv' : self.bidv.astype(numpy.float64),
+                                                 'askv' : self.askv.astype(numpy.float64)},
+                                                index = self.get_index(),
+                                                columns = self.price_fields + self.volume_fields)
+
+        return self._data_frame
+
+if __name__ == '__main__':
+    # see pythalesians.market.loaders.lowlevel.brokers.loaderdukascopy for creating CompactTicks
+    pass
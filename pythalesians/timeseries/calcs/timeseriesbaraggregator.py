@@ -0,0 +1,184 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+TimeSeriesBarAggregator
+
+Aggregates tick data into bars (OHLC of mid/trade price, closing bid/ask, average mid & spread, volumes and tick count)
+chunk by chunk, as the ticks are downloaded. Only the bars (and the last unfinished bar) are kept in memory, never
+the full set of ticks.
+
+Chunks must be added in time order (eg. hour by hour) and bar frequencies must be fixed (eg. '1s', '1min', '1h').
+
+"""
+
+import numpy
+import pandas
+
+class TimeSeriesBarAggregator:
+
+    # columns of the bars which are computed by the aggregator (as opposed to volume fields, which are summed vendor
+    # fields), these are already Thalesians fields so are never translated from/to vendor fields
+    BAR_FIELDS = ['open', 'high', 'low', 'close', 'mid', 'bid', 'ask', 'spread', 'tickcount']
+
+    def __init__(self, freq, bid_field = 'bid', ask_field = 'ask', price_field = None, volume_fields = None):
+        """
+        __init__ - Creates an aggregator for ticks
+
+        Parameters
+        ----------
+        freq : str
+            frequency of the bars (pandas offset alias, eg. '1min')
+        bid_field : str
+            column with bid quotes
+        ask_field : str
+            column with ask quotes
+        price_field : str (optional)
+            column with trade prices (if specified, used instead of bid/ask)
+        volume_fields : list(str) (optional)
+            columns to be summed over each bar
+        """
+        self.freq = freq
+        self.bid_field = bid_field
+        self.ask_field = ask_field
+        self.price_field = price_field
+        self.volume_fields = volume_fields
+
+        if self.volume_fields is None: self.volume_fields = []
+
+        self._bars = []
+        self._pending = None
+
+    def add_ticks(self, data_frame):
+        """
+        add_ticks - Adds the next chunk of ticks (which must come after all the ticks already added)
+
+        Parameters
+        ----------
+        data_frame : DataFrame
+            ticks with a DatetimeIndex
+        """
+        if data_frame is None: return
+        if data_frame.empty: return
+
+        agg = self._aggregate_chunk(data_frame)
+
+        # the first bar of this chunk might be the continuation of the last bar of the previous chunk
+        if self._pending is not None:
+            if self._pending['label'][0] == agg['label'][0]:
+                agg = self._merge_first(self._pending, agg)
+            else:
+                self._bars.append(self._create_bar_frame(self._pending))
+
+        # the last bar can't be finished until we see the next chunk
+        last = len(agg['label']) - 1
+
+        if last > 0:
+            self._bars.append(self._create_bar_frame(self._slice(agg, 0, last)))
+
+        self._pending = self._slice(agg, last, last + 1)
+
+    def get_bars(self):
+        """
+        get_bars - Gets all the bars aggregated so far (including the last, possibly unfinished, bar)
+
+        Returns
+        -------
+        DataFrame
+        """
+        bars = list(self._bars)
+
+        if self._pending is not None:
+            bars.append(self._create_bar_frame(self._pending))
+
+        if len(bars) == 0: return None
+
+        return pandas.concat(bars)
+
+    def _aggregate_chunk(self, data_frame):
+        if self.price_field is None:
+            bid = numpy.asarray(data_frame[self.bid_field].values, dtype = numpy.float64)
+            ask = numpy.asarray(data_frame[self.ask_field].values, dtype = numpy.float64)
+            mid = (bid + ask) / 2.0
+        else:
+            mid = numpy.asarray(data_frame[self.price_field].values, dtype = numpy.float64)
+
+        labels = data_frame.index.floor(self.freq)
+        label_ns = labels.asi8
+
+        # ticks are sorted, so each bar is a contiguous block
+        starts = numpy.flatnonzero(numpy.concatenate(([True], label_ns[1:] != label_ns[:-1])))
+        ends = numpy.append(starts[1:], len(label_ns))
+
+        agg = {'label' : labels[starts],
+               'open' : mid[starts],
+               'high' : numpy.maximum.reduceat(mid, starts),
+               'low' : numpy.minimum.reduceat(mid, starts),
+               'close' : mid[ends - 1],
+               'mid_sum' : numpy.add.reduceat(mid, starts),
+               'tickcount' : ends - starts}
+
+        if self.price_field is None:
+            agg['bid'] = bid[ends - 1]
+            agg['ask'] = ask[ends - 1]
+            agg['spread_sum'] = numpy.add.reduceat(ask - bid, starts)
+
+        for field in self.volume_fields:
+            agg[field] = numpy.add.reduceat(numpy.asarray(data_frame[field].values, dtype = numpy.float64), starts)
+
+        return agg
+
+    def _slice(self, agg, start, finish):
+        return dict((key, agg[key][start:finish]) for key in agg)
+
+    def _merge_first(self, pending, agg):
+        agg = dict((key, agg[key].copy()) if key != 'label' else (key, agg[key]) for key in agg)
+
+        agg['open'][0] = pending['open'][0]
+        agg['high'][0] = max(pending['high'][0], agg['high'][0])
+        agg['low'][0] = min(pending['low'][0], agg['low'][0])
+
+        for key in ['mid_sum', 'tickcount', 'spread_sum'] + self.volume_fields:
+            if key in agg: agg[key][0] = agg[key][0] + pending[key][0]
+
+        return agg
+
+    def _create_bar_frame(self, agg):
+        columns = ['open', 'high', 'low', 'close', 'mid']
+
+        data = {'open' : agg['open'], 'high' : agg['high'], 'low' : agg['low'], 'close' : agg['close'],
+                'mid' : agg['mid_sum'] / agg['tickcount']}
+
+        if self.price_field is None:
+            columns = columns + ['bid', 'ask', 'spread']
+
+            data['bid'] = agg['bid']
+            data['ask'] = agg['ask']
+            data['spread'] = agg['spread_sum'] / agg['tickcount']
+
+        for field in self.volume_fields:
+            columns.append(field)
+            data[field] = agg[field]
+
+        columns.append('tickcount')
+        data['tickcount'] = agg['tickcount'].astype(numpy.float64)
+
+        data_frame = pandas.DataFrame(data, index = agg['label'], columns = columns)
+        data_frame.index.name = 'Date'
+
+        return data_frame
+
+if __name__ == '__main__':
+    # see pythalesians_examples/markets/tick_examples.py for streaming bars from Dukascopy ticks
+    pass
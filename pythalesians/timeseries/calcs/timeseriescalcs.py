@@ -94,7 +94,7 @@ class TimeSeriesCalcs:
         """
         return signal_data_frame.shift(period_shift) * returns_data_frame
 
-    def calculate_individual_trade_gains(self, signal_data_frame, strategy_returns_data_frame):
+    def calculate_individual_trade_gains(self, signal_data_frame, strategy_returns_data_frame, trade_points = None):
         """
         calculate_individual_trade_gains - Calculates profits on every trade
 
@@ -104,45 +104,115 @@ class TimeSeriesCalcs:
             trading signals
         strategy_returns_data_frame: DataFrame
             returns of strategy to be tested
-        period_shift : int
-            number of periods to shift signal
+        trade_points : tuple (optional)
+            output of calculate_trade_points for these signals/returns (to avoid finding the trades again)
 
         Returns
         -------
-        DataFrame
+        DataFrame - return of each trade on the date it is closed (NaN on other dates)
         """
 
-        # signal need to be aligned to NEXT period for returns
-        signal_data_frame_pushed = signal_data_frame.shift(1)
+        if trade_points is None:
+            trade_points = self.calculate_trade_points(signal_data_frame, strategy_returns_data_frame)
+
+        trade_col, entry_row, exit_row, position, trade_returns = trade_points
+
+        trade_returns_matrix = numpy.empty(strategy_returns_data_frame.shape)
+        trade_returns_matrix.fill(numpy.nan)
+        trade_returns_matrix[exit_row, trade_col] = trade_returns
+
+        return pandas.DataFrame(trade_returns_matrix, index = strategy_returns_data_frame.index,
+                                columns = strategy_returns_data_frame.columns)
+
+    def calculate_trades(self, signal_data_frame, strategy_returns_data_frame, trade_points = None,
+                         include_flat = False):
+        """
+        calculate_trades - Creates a table of every trade (for each column, in date order). Periods when the position
+        is flat (signal of zero) aren't trades, so are left out unless include_flat is set
+
+        Parameters
+        ----------
+        signal_data_frame : DataFrame
+            trading signals
+        strategy_returns_data_frame: DataFrame
+            returns of strategy to be tested
+        trade_points : tuple (optional)
+            output of calculate_trade_points for these signals/returns (to avoid finding the trades again)
+        include_flat : bool
+            also include periods when the position is flat
+
+        Returns
+        -------
+        DataFrame - columns Strategy, Entry (date), Exit (date), Periods (held), Position (signal) and Return
+        """
+
+        if trade_points is None:
+            trade_points = self.calculate_trade_points(signal_data_frame, strategy_returns_data_frame)
+
+        trade_col, entry_row, exit_row, position, trade_returns = trade_points
+
+        if not(include_flat):
+            held = position != 0
+
+            trade_col, entry_row, exit_row, position, trade_returns = \
+                trade_col[held], entry_row[held], exit_row[held], position[held], trade_returns[held]
+
+        index = strategy_returns_data_frame.index
+
+        return pandas.DataFrame({'Strategy' : strategy_returns_data_frame.columns.values[trade_col],
+                                 'Entry' : index[entry_row], 'Exit' : index[exit_row],
+                                 'Periods' : exit_row - entry_row, 'Position' : position, 'Return' : trade_returns},
+                                columns = ['Strategy', 'Entry', 'Exit', 'Periods', 'Position', 'Return'])
+
+    def calculate_trade_points(self, signal_data_frame, strategy_returns_data_frame):
+        """
+        calculate_trade_points - Finds every trade for all the columns at once. A trade is opened whenever the signal
+        changes and closed when it next changes, and its return is the change in the multiplicative index of the
+        strategy returns over that time (ie. the compounded returns earned by the position, as strategy returns are
+        from signals pushed forward by one period).
+
+        Parameters
+        ----------
+        signal_data_frame : DataFrame
+            trading signals
+        strategy_returns_data_frame: DataFrame
+            returns of strategy to be tested
+
+        Returns
+        -------
+        numpy.array(int) x 4, numpy.array(float) - column, entry row, exit row, position (signal) and return of every
+        trade, ordered by column and then date
+        """
+
+        if not(signal_data_frame.index.equals(strategy_returns_data_frame.index)):
+            signal_data_frame = signal_data_frame.reindex(strategy_returns_data_frame.index)
+
+        signal = numpy.asarray(signal_data_frame.values, dtype = float)
+        cumulative = numpy.asarray(self.create_mult_index(strategy_returns_data_frame).values, dtype = float)
+
+        # find all the trade points (changes in signal, where there is a P&L)
+        trade_points = numpy.zeros(signal.shape, dtype = bool)
 
-        # find all the trade points
-        trade_points = ((signal_data_frame - signal_data_frame.shift(1)).abs())
-        cumulative = self.create_mult_index(strategy_returns_data_frame)
+        with numpy.errstate(invalid = 'ignore'):
+            trade_points[1:] = numpy.abs(signal[1:] - signal[:-1]) > 0
 
-        indices = trade_points > 0
-        indices.columns = cumulative.columns
+        trade_points = trade_points & ~numpy.isnan(cumulative)
 
-        # get P&L for every trade (from the end point - start point)
-        trade_returns = numpy.nan * cumulative
-        trade_points_cumulative = cumulative[indices]
+        # row of the last trade point before each row, in every column (-1 if none)
+        rows = numpy.arange(len(signal))[:, numpy.newaxis]
+        last_trade_point = numpy.maximum.accumulate(numpy.where(trade_points, rows, -1), axis = 0)
 
-        # for each set of signals/returns, calculate the trade returns - where there isn't a trade
-        # assign a NaN
-        # TODO do in one vectorised step without for loop
-        for col_name in trade_points_cumulative:
-            col = trade_points_cumulative[col_name]
-            col = col.dropna()
-            col = col / col.shift(1) - 1
+        previous_trade_point = numpy.empty(signal.shape, dtype = numpy.int64)
+        previous_trade_point.fill(-1)
+        previous_trade_point[1:] = last_trade_point[:-1]
 
-            # TODO experiment with quicker ways of writing below?
-            # for val in col.index:
-                # trade_returns.set_value(val, col_name, col[val])
-                # trade_returns.ix[val, col_name] = col[val]
+        # each trade point (apart from the first) closes the trade opened at the previous one
+        trade_col, exit_row = numpy.nonzero((trade_points & (previous_trade_point >= 0)).T)
+        entry_row = previous_trade_point[exit_row, trade_col]
 
-            date_indices = trade_returns.index.searchsorted(col.index)
-            trade_returns.ix[date_indices, col_name] = col
+        trade_returns = cumulative[exit_row, trade_col] / cumulative[entry_row, trade_col] - 1
 
-        return trade_returns
+        return trade_col, entry_row, exit_row, signal[entry_row, trade_col], trade_returns
 
     def calculate_signal_returns_matrix(self, signal_data_frame, returns_data_frame, period_shift = 1):
         """
@@ -553,7 +623,101 @@ class TimeSeriesCalcs:
             data = numpy.multiply(numpy.transpose(override_matrix), signal_df.values),
             index = signal_df.index, columns = signal_df.columns)
 
-    # several types of outer join (TODO finalise which one should appear!)
+    def outer_join(self, df_list, dtype = None):
+        """
+        outer_join - Outer joins many time series in one pass: the union of the dates is built once (merging the
+        already sorted indices), a single block is allocated for all the columns, and each time series is written into
+        its rows (found with searchsorted). Falls back to pandas_outer_join for anything other than numeric time series
+        with sorted, unique DatetimeIndices in the same time zone.
+
+        Parameters
+        ----------
+        df_list : list(DataFrame)
+            time series to join (None elements are ignored)
+        dtype : numpy.dtype (optional)
+            type of the output, by default the smallest float type which can hold all the inputs (eg. float32 if all
+            inputs are float32)
+
+        Returns
+        -------
+        DataFrame
+        """
+        if df_list is None: return None
+
+        # remove any None elements (which can't be joined!)
+        df_list = [i for i in df_list if i is not None]
+
+        if len(df_list) == 0: return None
+        elif len(df_list) == 1: return df_list[0]
+
+        if not self._is_block_joinable(df_list): return self.pandas_outer_join(df_list)
+
+        # no copy for time series of a single type (the usual case)
+        values_list = [df.values for df in df_list]
+
+        # eg. dates, strings or booleans (or a mix of types, which numpy has to put in an object array)
+        for values in values_list:
+            if values.dtype.kind not in 'fiu': return self.pandas_outer_join(df_list)
+
+        if dtype is None:
+            dtype = numpy.result_type(numpy.float32, *[values.dtype for values in values_list])
+
+        # nanoseconds since 1970 (UTC if there is a time zone)
+        index_list = [self._get_index_ns(df.index) for df in df_list]
+
+        # each index is already sorted, so a stable sort just merges the runs together (in place, to save memory)
+        union = numpy.concatenate(index_list)
+        union.sort(kind = 'mergesort')
+
+        if len(union) > 0:
+            union = union[numpy.concatenate(([True], union[1:] != union[:-1]))]
+
+        columns = [col for df in df_list for col in df.columns]
+
+        # column major, which is how pandas stores it (so it doesn't need to be copied)
+        block = numpy.empty((len(union), len(columns)), dtype = dtype, order = 'F')
+        block.fill(numpy.nan)
+
+        col = 0
+
+        for i in range(0, len(df_list)):
+            width = len(df_list[i].columns)
+
+            block[union.searchsorted(index_list[i]), col:col + width] = values_list[i]
+
+            col = col + width
+
+        index = pandas.DatetimeIndex(union.astype('datetime64[ns]'), name = df_list[0].index.name)
+
+        if df_list[0].index.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(df_list[0].index.tz)
+
+        return pandas.DataFrame(block, index = index, columns = columns, copy = False)
+
+    def _get_index_ns(self, index):
+        # asi8 is a view, but newer versions of pandas can have indices in units other than nanoseconds
+        if getattr(index, 'unit', 'ns') != 'ns': index = index.as_unit('ns')
+
+        return index.asi8
+
+    def _is_block_joinable(self, df_list):
+        tz = str(df_list[0].index.tz) if isinstance(df_list[0].index, pandas.DatetimeIndex) else None
+        columns = set()
+
+        for df in df_list:
+            if not isinstance(df.index, pandas.DatetimeIndex): return False
+            if str(df.index.tz) != tz: return False
+            if not (df.index.is_monotonic_increasing and df.index.is_unique): return False
+
+            # overlapping column names need suffixes, leave that to pandas
+            for c in df.columns:
+                if c in columns: return False
+
+                columns.add(c)
+
+        return True
+
+    # other types of outer join (outer_join is preferred, see pythalesians_examples/benchmarks/outer_join_benchmark.py)
     def pandas_outer_join(self, df_list):
         if df_list is None: return None
 
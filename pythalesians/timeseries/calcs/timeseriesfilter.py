@@ -20,9 +20,12 @@ Functions for filtering time series by dates and columns.
 """
 
 from pythalesians.util.configmanager import ConfigManager
+from pythalesians.util.holidaycalendar import HolidayCalendar
 from pythalesians.util.loggermanager import LoggerManager
 
-from pandas.tseries.offsets import CustomBusinessDay
+import collections
+import threading
+import weakref
 
 import numpy as np
 import pandas
@@ -32,6 +35,16 @@ class TimeSeriesFilter:
 
     _time_series_cache = {} # shared across all instances of object!
 
+    # (id(index), cal) => (weak reference to index, business day mask), shared across all instances of object!
+    _bus_day_mask_cache = collections.OrderedDict()
+    _bus_day_mask_cache_size = 32
+    _bus_day_mask_lock = threading.Lock()
+
+    # id(columns) => (weak reference to columns, dict of column => position), shared across all instances of object!
+    _column_position_cache = collections.OrderedDict()
+    _column_position_cache_size = 256
+    _column_position_lock = threading.Lock()
+
     def __init__(self):
         # self.config = ConfigManager()
         self.logger = LoggerManager().getLogger(__name__)
@@ -55,14 +68,105 @@ class TimeSeriesFilter:
         start_date = time_series_request.start_date
         finish_date = time_series_request.finish_date
 
-        data_frame = self.filter_time_series_by_date(start_date, finish_date, data_frame)
-
         # filter by ticker.field combinations requested
         columns = self.create_tickers_fields_list(time_series_request)
+
+        try:
+            return self.filter_time_series_by_date_columns(start_date, finish_date, columns, data_frame)
+        except (TypeError, ValueError):
+            pass
+
+        # slower path, eg. for indices of dates (as opposed to TimeStamps), or which aren't sorted
+        data_frame = self.filter_time_series_by_date(start_date, finish_date, data_frame)
         data_frame = self.filter_time_series_by_columns(columns, data_frame)
 
         return data_frame
 
+    def filter_time_series_by_date_columns(self, start_date, finish_date, columns, data_frame):
+        """
+        filter_time_series_by_date_columns - Filter time series by start/finish dates (like filter_time_series_by_date)
+        and columns, with one binary search for each date and column positions which are cached for each set of
+        columns. Rows are sliced before any columns are copied, and a view is returned if the columns are adjacent and
+        in order (or all the columns are selected).
+
+        Parameters
+        ----------
+        start_date : DateTime
+            start date
+        finish_date : DateTime
+            finish date
+        columns : list(str)
+            columns to select
+        data_frame : DataFrame
+            data frame to be filtered (with a sorted index)
+
+        Returns
+        -------
+        DataFrame
+        """
+        index = data_frame.index
+
+        if not(index.is_monotonic_increasing):
+            raise ValueError("Index is not sorted")
+
+        start_index = 0
+        finish_index = len(index)
+
+        if start_date is not None: start_index = index.searchsorted(start_date)
+        if finish_date is not None: finish_index = index.searchsorted(finish_date)
+
+        positions = self.get_column_positions(columns, data_frame)
+
+        data_frame = data_frame.iloc[start_index:max(start_index, finish_index)]
+
+        if len(positions) > 0 and positions == list(range(positions[0], positions[-1] + 1)):
+            return data_frame.iloc[:, positions[0]:positions[-1] + 1]
+
+        return data_frame.iloc[:, positions]
+
+    def get_column_positions(self, columns, data_frame):
+        """
+        get_column_positions - Gets the positions of columns in a data frame, using a mapping of column names to
+        positions which is created once for each set of columns
+
+        Parameters
+        ----------
+        columns : list(str)
+            columns to find
+        data_frame : DataFrame
+            data frame with these columns
+
+        Returns
+        -------
+        list(int)
+        """
+        key = id(data_frame.columns)
+        mapping = None
+
+        with TimeSeriesFilter._column_position_lock:
+            if key in TimeSeriesFilter._column_position_cache:
+                columns_ref, mapping = TimeSeriesFilter._column_position_cache[key]
+
+                if columns_ref() is not data_frame.columns: mapping = None
+
+        if mapping is None:
+            if not(data_frame.columns.is_unique):
+                raise ValueError("Columns are not unique")
+
+            mapping = dict((c, i) for i, c in enumerate(data_frame.columns))
+
+            with TimeSeriesFilter._column_position_lock:
+                cache = TimeSeriesFilter._column_position_cache
+
+                for k in [k for k, v in cache.items() if v[0]() is None]: del cache[k]
+
+                cache.pop(key, None)
+                cache[key] = (weakref.ref(data_frame.columns), mapping)
+
+                while len(cache) > TimeSeriesFilter._column_position_cache_size: cache.popitem(last = False)
+
+        return [mapping[c] for c in columns]
+
     def create_calendar_bus_days(self, start_date, end_date, cal = 'FX'):
         """
         create_calendar_bus_days - Creates a calendar of business days)
@@ -80,10 +184,9 @@ class TimeSeriesFilter:
         -------
         list
         """
-        hols = self.get_holidays(start_date, end_date, cal)
         index = pandas.bdate_range(start=start_date, end=end_date, freq='D')
 
-        return [x for x in index if x not in hols]
+        return list(index[self.get_bus_day_mask(index, cal, use_cache = False)])
 
     def get_holidays(self, start_date, end_date, cal = 'FX'):
         """
@@ -103,32 +206,16 @@ class TimeSeriesFilter:
         list
         """
 
-        # TODO use Pandas CustomBusinessDays to get more calendars
-        holidays_list = []
-
-        if cal == 'FX':
-            # filter for Christmas & New Year's Day
-            for i in range(1970, 2020):
-                holidays_list.append(str(i) + "-12-25")
-                holidays_list.append(str(i) + "-01-01")
-
-        if cal == 'WEEKDAY':
-            bday = CustomBusinessDay(weekmask='Sat Sun')
-
-            holidays_list = pandas.date_range(start_date, end_date, freq=bday)
-
-        # holidays_list = pandas.to_datetime(holidays_list).order()
-        holidays_list = pandas.to_datetime(holidays_list).sort_values()
+        # calendars are built once in HolidayCalendar (add more with HolidayCalendar.register_calendar)
+        hc = HolidayCalendar()
 
         # floor start date
-        start = np.datetime64(start_date) - np.timedelta64(1, 'D')
+        start = hc.to_datetime64(start_date) - np.timedelta64(1, 'D')
 
         # ceiling end date
-        end = np.datetime64(end_date) + np.timedelta64(1, 'D')
+        end = hc.to_datetime64(end_date) + np.timedelta64(1, 'D')
 
-        holidays_list = [x for x in holidays_list if x >= start and x <= end]
-
-        return pandas.to_datetime(holidays_list)
+        return pandas.DatetimeIndex(hc.get_holidays(start, end, cal))
 
     def filter_time_series_by_holidays(self, data_frame, cal = 'FX'):
         """
@@ -146,55 +233,94 @@ class TimeSeriesFilter:
         DataFrame
         """
 
-        # optimal case for weekdays: remove Saturday and Sunday
-        if (cal == 'WEEKDAY'):
-            return data_frame.ix[data_frame.index.dayofweek <= 4]
+        if len(data_frame.index) == 0:
+            return data_frame
 
-        # select only those holidays in the sample
-        holidays_start = self.get_holidays(data_frame.index[0], data_frame.index[-1], cal)
+        # mask is cached, so other time series with the same index can reuse it
+        mask = self.get_bus_day_mask(data_frame.index, cal)
 
-        if(holidays_start.size == 0):
+        if mask.all():
             return data_frame
 
-        holidays_end = holidays_start + np.timedelta64(1,'D')
+        return data_frame[mask]
 
-        # floored_dates = data_frame.index.normalize()
-        #
-        # filter_by_index_start = floored_dates.searchsorted(holidays_start)
-        # filter_by_index_end = floored_dates.searchsorted(holidays_end)
-        #
-        # indices_to_keep = []
-        #
-        # if filter_by_index_end[0] == 0:
-        #     counter = filter_by_index_end[0] + 1
-        #     start_index = 1
-        # else:
-        #     counter = 0
-        #     start_index = 0
-        #
-        # for i in range(start_index, len(holidays_start)):
-        #     indices = list(range(counter, filter_by_index_start[i] - 1))
-        #     indices_to_keep = indices_to_keep + indices
-        #
-        #     counter = filter_by_index_end[i] + 1
-        #
-        # indices = list(range(counter, len(floored_dates)))
-        # indices_to_keep = indices_to_keep + indices
-        #
-        # data_frame_filtered = data_frame.ix[indices_to_keep]
+    def get_bus_day_mask(self, index, cal = 'FX', use_cache = True):
+        """
+        get_bus_day_mask - Finds which dates in an index are not holidays, by looking up the day of each date
+        (in the time zone of the index) in the holiday calendar. Masks are cached per index object and calendar
+        (until the calendar is replaced).
+
+        Parameters
+        ----------
+        index : DatetimeIndex
+            dates to check (need not be sorted)
+        cal : str
+            business calendar to use
+        use_cache : bool
+            reuse (and store) the mask for this index object
+
+        Returns
+        -------
+        numpy.array(bool) - True for dates which aren't holidays (read only)
+        """
+        key = (id(index), cal, HolidayCalendar().get_calendar_version(cal))
+
+        if use_cache:
+            with TimeSeriesFilter._bus_day_mask_lock:
+                if key in TimeSeriesFilter._bus_day_mask_cache:
+                    index_ref, mask = TimeSeriesFilter._bus_day_mask_cache[key]
+
+                    # the id may have been reused by a new index, after the old one was deleted
+                    if index_ref() is index: return mask
+
+        mask = self.create_bus_day_mask(index, cal)
+        mask.setflags(write = False)
+
+        if use_cache:
+            try:
+                index_ref = weakref.ref(index)
+            except TypeError:
+                return mask
+
+            with TimeSeriesFilter._bus_day_mask_lock:
+                cache = TimeSeriesFilter._bus_day_mask_cache
+
+                # drop masks for indices which have been deleted, then the oldest
+                for k in [k for k, v in cache.items() if v[0]() is None]: del cache[k]
+
+                cache.pop(key, None)
+                cache[key] = (index_ref, mask)
+
+                while len(cache) > TimeSeriesFilter._bus_day_mask_cache_size: cache.popitem(last = False)
+
+        return mask
+
+    def create_bus_day_mask(self, index, cal = 'FX'):
+        index = pandas.DatetimeIndex(index)
+
+        # use local days for time zone aware dates
+        if index.tz is not None: index = index.tz_localize(None)
+
+        days = index.values.astype('M8[D]')
+
+        if len(days) == 0:
+            return np.ones(0, dtype = bool)
+
+        # optimal case for weekdays: remove Saturday and Sunday (1st January 1970 was a Thursday)
+        if (cal == 'WEEKDAY'):
+            return (days.astype(np.int64) + 3) % 7 < 5
 
-        data_frame_left = data_frame
-        data_frame_filtered = []
+        holidays = HolidayCalendar().get_holiday_array(cal, days.min().astype('M8[Y]').astype(int) + 1970,
+                                                       days.max().astype('M8[Y]').astype(int) + 1970)
 
-        for i in range(0, len(holidays_start)):
-            data_frame_temp = data_frame_left.ix[data_frame_left.index < holidays_start[i]]
-            data_frame_left = data_frame_left.ix[data_frame_left.index >= holidays_end[i]]
+        if len(holidays) == 0:
+            return np.ones(len(days), dtype = bool)
 
-            data_frame_filtered.append(data_frame_temp)
+        holidays = holidays.astype('M8[D]')
 
-        data_frame_filtered.append(data_frame_left)
+        position = np.minimum(holidays.searchsorted(days), len(holidays) - 1)
 
-        return pandas.concat(data_frame_filtered)
+        return holidays[position] != days
 
     def filter_time_series_by_date(self, start_date, finish_date, data_frame):
         """
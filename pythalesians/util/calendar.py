@@ -23,19 +23,25 @@ into account market holidays.
 import pandas
 from pandas.tseries.offsets import BDay
 
+import collections
 import numpy
-import datetime
+import threading
 import pandas.tseries.offsets
 
-from pythalesians.timeseries.calcs.timeseriesfilter import TimeSeriesFilter
+from pythalesians.util.holidaycalendar import HolidayCalendar
 from pythalesians.timeseries.calcs.timeseriestimezone import TimeSeriesTimezone
 
 from datetime import timedelta
-from pandas.tseries.offsets import CustomBusinessDay
 from pandas.tseries.offsets import CustomBusinessMonthBegin
 
 class Calendar:
 
+    # (calendar, calendar version, start month, finish month) => (business days, business day of month), shared
+    # across all instances
+    _bus_day_of_month_cache = collections.OrderedDict()
+    _bus_day_of_month_cache_size = 64
+    _bus_day_of_month_lock = threading.Lock()
+
     def get_business_days_tenor(self, tenor):
         if tenor == '1W':
             return 5
@@ -79,99 +85,63 @@ class Calendar:
         """ get_bus_day_of_month(date = list of dates, cal = calendar name)
 
             returns the business day of the month (ie. 3rd Jan, on a Monday,
-            would be the 1st business day of the month
+            would be the 1st business day of the month), dates which aren't business days get the number of the
+            next business day
+        """
+        date = pandas.DatetimeIndex(date)
+
+        if date.tz is not None: date = date.tz_localize(None)
+
+        # strip times off the dates - for business dates just want dates!
+        date = date.values.astype('M8[D]')
+
+        if len(date) == 0: return numpy.zeros(0)
+
+        # until the end of the month after the last date, so dates after the last business day of a month are 1
+        start_month = date.min().astype('M8[M]')
+        finish_month = date.max().astype('M8[M]') + numpy.timedelta64(1, 'M')
+
+        bus_dates, work_day_index = self.get_bus_day_of_month_table(start_month, finish_month, cal)
+
+        return work_day_index[bus_dates.searchsorted(date)]
+
+    def get_bus_day_of_month_table(self, start_month, finish_month, cal = 'FX'):
+        """ get_bus_day_of_month_table(start_month = first month, finish_month = last month, cal = calendar name)
+
+            returns the business days (as datetime64[D]) from the start of start_month to the end of finish_month
+            and their business day of the month (cached for each calendar and range of months, until the calendar
+            is replaced)
         """
-        tsf = TimeSeriesFilter()
-
-        try:
-            date = date.normalize() # strip times off the dates - for business dates just want dates!
-        except: pass
-
-        start = pandas.to_datetime(datetime.datetime(date.year[0], date.month[0], 1))
-        end = datetime.datetime.today()#pandas.to_datetime(datetime.datetime(date.year[-1], date.month[-1], date.day[-1]))
-
-        holidays = tsf.get_holidays(start, end, cal)
-
-        bday = CustomBusinessDay(holidays=holidays, weekmask='Mon Tue Wed Thu Fri')
-
-        bus_dates = pandas.date_range(start, end, freq=bday)
-
-        month = bus_dates.month
-
-        work_day_index = numpy.zeros(len(bus_dates))
-        work_day_index[0] = 1
-
-        for i in range(1, len(bus_dates)):
-            if month[i] == month[i-1]:
-                work_day_index[i] = work_day_index[i-1] + 1
-            else:
-                work_day_index[i] = 1
-
-        bus_day_of_month = work_day_index[bus_dates.searchsorted(date)]
-
-        # bus_day_of_month = numpy.zeros(len(date))
-        # for i in range(0, len(date)):
-        #     index = bus_dates.searchsorted(date[i])
-        #     bus_day_of_month[i] = work_day_index[index]
-
-        #
-        # holidays = tsf.get_holidays(start, end, cal)
-        #
-        # bday = CustomBusinessDay(holidays=holidays, weekmask='Mon Tue Wed Thu Fri')
-        # bmth_begin = CustomBusinessMonthBegin(holidays=holidays)
-
-        # tsf = TimeSeriesFilter()
-        #
-        # # floored_dates = datetime.date(date.year, date.month, date.day[0])
-        # start = pandas.to_datetime(datetime.datetime(date.year[0], date.month[0], 1))
-        # end = pandas.to_datetime(datetime.datetime(date.year[-1], date.month[-1], date.day[-1]))
-        #
-        # holidays = tsf.get_holidays(start, end, cal)
-        #
-        # bday = CustomBusinessDay(holidays=holidays, weekmask='Mon Tue Wed Thu Fri')
-        # bmth_begin = CustomBusinessMonthBegin(holidays=holidays)
-        #
-        # bus_day_dict = {}
-        # first_day_of_month = []
-        # first_day_of_month.append(start - bmth_begin)
-        #
-        # i = 0
-        #
-        # while(first_day_of_month[i-1] <= end):
-        #     first_day_of_month.append(first_day_of_month[i-1] + bmth_begin)
-        #     i = i + 1
-        #
-        # # create a dictionary of dates and business day of the month
-        # # fill every day with NaN to begin with (to be overwritten)
-        # # will fail if our data contains weekends
-        # last_date = first_day_of_month[0]
-        #
-        # while(last_date <= end):
-        #     bus_day_dict[last_date.year * 10000 + last_date.month * 100 + last_date.day] = numpy.NaN
-        #     last_date = last_date + pandas.DateOffset(1)
-        #
-        # # for the business days
-        # # create a dictionary of dates and business day of the month
-        # for first in first_day_of_month:
-        #     curr_month = first.month
-        #     last_date = first
-        #
-        #     bus_day_offset = 1
-        #
-        #     while(curr_month == last_date.month):
-        #         bus_day_dict[last_date.year * 10000 + last_date.month * 100 + last_date.day] = bus_day_offset
-        #         last_date = last_date + bday
-        #         bus_day_offset = bus_day_offset + 1
-        #
-        # date_key = date.year * 10000 + date.month * 100 + date.day
-        #
-        # date_key_unique = numpy.unicode(date_key)
-        #
-        # # if the day doesn't appear in the calendar assign -1
-        # #bus_day_of_month = map(lambda x: bus_day_dict[x], date_key)
-        # find_bus_ordinal = numpy.vectorize(lambda x: bus_day_dict[x])
-        # bus_day_of_month = find_bus_ordinal(date_key_unique)
-        # #[lambda x: bus_day_dict[x] for x in date]
-
-        return bus_day_of_month
+        key = (cal, HolidayCalendar().get_calendar_version(cal), str(start_month), str(finish_month))
+
+        with Calendar._bus_day_of_month_lock:
+            if key in Calendar._bus_day_of_month_cache: return Calendar._bus_day_of_month_cache[key]
+
+        dates = numpy.arange(start_month.astype('M8[D]'), (finish_month + numpy.timedelta64(1, 'M')).astype('M8[D]'),
+                             dtype = 'M8[D]')
+
+        holidays = HolidayCalendar().get_holiday_array(cal, start_month.astype('M8[Y]').astype(int) + 1970,
+                                                       finish_month.astype('M8[Y]').astype(int) + 1970)
+
+        # Mon to Fri (1st January 1970 was a Thursday), excluding holidays
+        bus_dates = dates[((dates.astype(numpy.int64) + 3) % 7 < 5) & ~numpy.isin(dates, holidays.astype('M8[D]'))]
+
+        # count business days since the first business day of each month
+        position = numpy.arange(len(bus_dates))
+        month = bus_dates.astype('M8[M]')
+
+        new_month = numpy.ones(len(bus_dates), dtype = bool)
+        new_month[1:] = month[1:] != month[:-1]
+
+        work_day_index = (position - numpy.maximum.accumulate(numpy.where(new_month, position, 0)) + 1).astype(float)
+
+        bus_dates.setflags(write = False)
+        work_day_index.setflags(write = False)
+
+        with Calendar._bus_day_of_month_lock:
+            Calendar._bus_day_of_month_cache[key] = (bus_dates, work_day_index)
+
+            while len(Calendar._bus_day_of_month_cache) > Calendar._bus_day_of_month_cache_size:
+                Calendar._bus_day_of_month_cache.popitem(last = False)
 
+        return bus_dates, work_day_index
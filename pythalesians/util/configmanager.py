@@ -17,9 +17,17 @@ ConfigManager
 
 Functions for converting between vendor tickers and Thalesians tickers (and vice-versa).
 
+The dictionaries parsed from the CSV files are saved as a snapshot (JSON, so loading it can't run any code) in the
+temporary folder, which is loaded instead of parsing the CSV files again, as long as none of the CSV files has changed
+since.
+
 """
 
 import csv
+import datetime
+import json
+import os
+
 from pythalesians.util.constants import Constants
 from pythalesians.util.singleton import Singleton
 from pythalesians.util.loggermanager import LoggerManager
@@ -43,6 +51,18 @@ class ConfigManager(object):
     # store categories ->
     _dict_time_series_tickers_list_library = {}
 
+    # dictionaries saved in the snapshot
+    _snapshot_dicts = ['_dict_time_series_tickers_list_library_to_vendor',
+                       '_dict_time_series_tickers_list_vendor_to_library',
+                       '_dict_time_series_fields_list_vendor_to_library',
+                       '_dict_time_series_fields_list_library_to_vendor',
+                       '_dict_time_series_category_fields_library_to_library',
+                       '_dict_time_series_category_startdate_library_to_library',
+                       '_dict_time_series_category_tickers_library_to_library',
+                       '_dict_time_series_tickers_list_library']
+
+    _snapshot_version = 2
+
     def __init__(self, *args, **kwargs):
         if ConfigManager._is_init == 0:
             try:
@@ -55,6 +75,105 @@ class ConfigManager(object):
     ### time series ticker manipulators
     @staticmethod
     def populate_time_series_dictionaries():
+        """
+        populate_time_series_dictionaries - Fills the dictionaries for converting tickers/fields, from the snapshot if
+        it is still up to date, otherwise by parsing the CSV files (and then saving a new snapshot)
+        """
+
+        csv_files = ConfigManager.get_csv_files()
+        signature = ConfigManager.get_csv_signature(csv_files)
+
+        if ConfigManager.load_snapshot(signature): return
+
+        ConfigManager.parse_csv_files()
+        ConfigManager.save_snapshot(signature)
+
+    @staticmethod
+    def get_csv_files():
+        return Constants().time_series_tickers_list.split(';') + \
+               [Constants().time_series_fields_list, Constants().time_series_categories_fields]
+
+    @staticmethod
+    def get_csv_signature(csv_files):
+        # if any of the CSV files is modified, its modification time (or size) will change
+        signature = []
+
+        for f in csv_files:
+            stat = os.stat(f)
+            signature.append((os.path.abspath(f), stat.st_mtime, stat.st_size))
+
+        return signature
+
+    @staticmethod
+    def get_snapshot_file():
+        return os.path.join(Constants().temp_pythalesians_folder, 'configmanager_snapshot.json')
+
+    @staticmethod
+    def load_snapshot(signature):
+        """
+        load_snapshot - Fills the dictionaries from the snapshot, if it was made from the same CSV files
+
+        Parameters
+        ----------
+        signature : list
+            path, modification time and size of each CSV file
+
+        Returns
+        -------
+        bool (False if there is no up to date snapshot)
+        """
+
+        try:
+            with open(ConfigManager.get_snapshot_file(), 'r') as f:
+                snapshot = json.load(f)
+
+            if snapshot.get('version') != ConfigManager._snapshot_version: return False
+
+            # JSON turns the tuples into lists
+            if snapshot.get('signature') != [list(x) for x in signature]: return False
+
+            dicts = snapshot['dicts']
+
+            # JSON has no dates, so start dates are stored as strings (YYYY-MM-DD)
+            startdates = dicts['_dict_time_series_category_startdate_library_to_library']
+
+            for key in startdates:
+                startdates[key] = datetime.datetime.strptime(startdates[key], '%Y-%m-%d').date()
+
+            for d in ConfigManager._snapshot_dicts:
+                setattr(ConfigManager, d, dicts[d])
+        except:
+            return False
+
+        return True
+
+    @staticmethod
+    def save_snapshot(signature):
+        dicts = dict((d, getattr(ConfigManager, d)) for d in ConfigManager._snapshot_dicts)
+
+        startdates = dicts['_dict_time_series_category_startdate_library_to_library']
+        dicts['_dict_time_series_category_startdate_library_to_library'] = \
+            dict((key, startdates[key].strftime('%Y-%m-%d')) for key in startdates)
+
+        snapshot = {'version' : ConfigManager._snapshot_version, 'signature' : signature, 'dicts' : dicts}
+
+        snapshot_file = ConfigManager.get_snapshot_file()
+
+        try:
+            if not os.path.exists(os.path.dirname(snapshot_file)): os.makedirs(os.path.dirname(snapshot_file))
+
+            # write to a temporary file first, so other processes never read a half written snapshot
+            temp_file = snapshot_file + '.' + str(os.getpid())
+
+            with open(temp_file, 'w') as f:
+                json.dump(snapshot, f)
+
+            os.replace(temp_file, snapshot_file)
+        except:
+            LoggerManager().getLogger(__name__).warning("Couldn't save snapshot of ticker dictionaries")
+
+    @staticmethod
+    def parse_csv_files():
 
         # there are several CSV files which contain data on the tickers
 
@@ -223,6 +342,35 @@ class ConfigManager(object):
         return ConfigManager._dict_time_series_fields_list_library_to_vendor[
             source + '.' + field]
 
+    ### bulk converters (for lists of tickers/fields)
+    @staticmethod
+    def convert_library_to_vendor_ticker_list(category, source, freq, cut, tickers):
+        prefix = category + '.' + source + '.' + freq + '.' + cut + '.'
+        dictionary = ConfigManager._dict_time_series_tickers_list_library_to_vendor
+
+        return [dictionary[prefix + ticker] for ticker in tickers]
+
+    @staticmethod
+    def convert_vendor_to_library_ticker_list(source, sourcetickers):
+        prefix = source + '.'
+        dictionary = ConfigManager._dict_time_series_tickers_list_vendor_to_library
+
+        return [dictionary[prefix + sourceticker] for sourceticker in sourcetickers]
+
+    @staticmethod
+    def convert_vendor_to_library_field_list(source, sourcefields):
+        prefix = source + '.'
+        dictionary = ConfigManager._dict_time_series_fields_list_vendor_to_library
+
+        return [dictionary[prefix + sourcefield] for sourcefield in sourcefields]
+
+    @staticmethod
+    def convert_library_to_vendor_field_list(source, fields):
+        prefix = source + '.'
+        dictionary = ConfigManager._dict_time_series_fields_list_library_to_vendor
+
+        return [dictionary[prefix + field] for field in fields]
+
 
 ## test function
 if __name__ == '__main__':
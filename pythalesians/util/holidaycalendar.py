@@ -0,0 +1,177 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+HolidayCalendar
+
+Registry of holiday calendars. Each calendar is defined by a rule giving its holidays for a range of years, and is
+built once (for every year from start_year to finish_year, extended if dates outside these are asked for) as a sorted
+datetime64 array, shared across all instances. Holidays between two dates are then found by binary search.
+
+Calendars 'FX' (Christmas and New Year's Day) and 'WEEKDAY' (Saturdays and Sundays) are registered by default, others
+can be added with register_calendar.
+
+"""
+
+import threading
+
+import numpy
+import pandas
+
+def fx_holidays(start_year, finish_year):
+    # Christmas & New Year's Day
+    years = (numpy.arange(start_year, finish_year + 1) - 1970).astype('M8[Y]')
+
+    new_year = years.astype('M8[D]')
+    christmas = (years.astype('M8[M]') + numpy.timedelta64(11, 'M')).astype('M8[D]') + numpy.timedelta64(24, 'D')
+
+    return numpy.concatenate([new_year, christmas])
+
+def weekend_holidays(start_year, finish_year):
+    days = numpy.arange(numpy.datetime64(str(start_year) + '-01-01'),
+                        numpy.datetime64(str(finish_year + 1) + '-01-01'), dtype = 'M8[D]')
+
+    # 1st January 1970 was a Thursday
+    day_of_week = (days.astype(numpy.int64) + 3) % 7
+
+    return days[day_of_week >= 5]
+
+class HolidayCalendar:
+
+    start_year = 1970
+    finish_year = 2100
+
+    # shared across all instances of object!
+    _rules = {'FX' : fx_holidays, 'WEEKDAY' : weekend_holidays}
+    _calendars = {}         # calendar => (start year, finish year, sorted datetime64[ns] array)
+    _versions = {}          # calendar => number of times it has been replaced
+    _lock = threading.Lock()
+
+    def register_calendar(self, cal, rule):
+        """
+        register_calendar - Adds (or replaces) a calendar
+
+        Parameters
+        ----------
+        cal : str
+            name of calendar
+        rule : function(int, int)
+            gives a list of holidays (as anything pandas.to_datetime understands) from a start year to a finish year
+            (inclusive)
+        """
+        with HolidayCalendar._lock:
+            HolidayCalendar._rules[cal] = rule
+            HolidayCalendar._calendars.pop(cal, None)
+            HolidayCalendar._versions[cal] = HolidayCalendar._versions.get(cal, 0) + 1
+
+    def get_calendar_version(self, cal):
+        """
+        get_calendar_version - Gets the version of a calendar, which changes whenever it is registered (so anything
+        cached from the calendar can be keyed on it)
+
+        Parameters
+        ----------
+        cal : str
+            name of calendar
+
+        Returns
+        -------
+        int
+        """
+        with HolidayCalendar._lock:
+            return HolidayCalendar._versions.get(cal, 0)
+
+    def get_calendars(self):
+        with HolidayCalendar._lock:
+            return sorted(HolidayCalendar._rules.keys())
+
+    def get_holiday_array(self, cal = 'FX', start_year = None, finish_year = None):
+        """
+        get_holiday_array - Gets every holiday in a calendar, building it if necessary
+
+        Parameters
+        ----------
+        cal : str
+            name of calendar
+        start_year : int (optional)
+            calendar must start no later than this year
+        finish_year : int (optional)
+            calendar must finish no earlier than this year
+
+        Returns
+        -------
+        numpy.array(datetime64[ns]) - sorted and read only (empty for unknown calendars)
+        """
+        if start_year is None: start_year = self.start_year
+        if finish_year is None: finish_year = self.finish_year
+
+        with HolidayCalendar._lock:
+            if cal not in HolidayCalendar._rules: return numpy.array([], dtype = 'M8[ns]')
+
+            if cal in HolidayCalendar._calendars:
+                built_start_year, built_finish_year, holidays = HolidayCalendar._calendars[cal]
+
+                if built_start_year <= start_year and built_finish_year >= finish_year: return holidays
+
+                start_year = min(start_year, built_start_year)
+                finish_year = max(finish_year, built_finish_year)
+            else:
+                start_year = min(start_year, self.start_year)
+                finish_year = max(finish_year, self.finish_year)
+
+            holidays = pandas.to_datetime(HolidayCalendar._rules[cal](start_year, finish_year))
+            holidays = numpy.unique(numpy.asarray(holidays, dtype = 'M8[ns]'))
+            holidays.setflags(write = False)
+
+            HolidayCalendar._calendars[cal] = (start_year, finish_year, holidays)
+
+            return holidays
+
+    def get_holidays(self, start_date, finish_date, cal = 'FX'):
+        """
+        get_holidays - Gets the holidays in a calendar between two dates (inclusive)
+
+        Parameters
+        ----------
+        start_date : DateTime
+            start date
+        finish_date : DateTime
+            finish date
+        cal : str
+            name of calendar
+
+        Returns
+        -------
+        numpy.array(datetime64[ns])
+        """
+        start_date = self.to_datetime64(start_date)
+        finish_date = self.to_datetime64(finish_date)
+
+        holidays = self.get_holiday_array(cal, start_date.astype('M8[Y]').astype(int) + 1970,
+                                          finish_date.astype('M8[Y]').astype(int) + 1970)
+
+        return holidays[holidays.searchsorted(start_date, side = 'left'):
+                        holidays.searchsorted(finish_date, side = 'right')]
+
+    def to_datetime64(self, date):
+        date = pandas.Timestamp(date)
+
+        # compare time zone aware dates in UTC
+        if date.tz is not None: date = date.tz_convert(None)
+
+        return numpy.datetime64(date.value, 'ns')
+
+if __name__ == '__main__':
+    # see pythalesians.timeseries.calcs.timeseriesfilter, which uses HolidayCalendar
+    pass
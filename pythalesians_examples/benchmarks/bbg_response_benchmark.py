@@ -0,0 +1,126 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+bbg_response_benchmark
+
+Measures how long the Bloomberg loaders take to turn a response split into thousands of chunks into a DataFrame,
+collecting all the chunks and creating the DataFrame once (as BBGLowLevelTemplate does now) versus adding each chunk
+to the DataFrame as it arrives (as it used to, which copies the whole DataFrame for every chunk). Uses fakeblpapi to
+create the events (so no Bloomberg connection is needed).
+
+"""
+
+import sys
+import time
+import datetime
+
+import pandas
+
+from pythalesians_examples.benchmarks import fakeblpapi
+
+sys.modules['blpapi'] = fakeblpapi
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.market.requests.timeseriesrequest import TimeSeriesRequest
+from pythalesians.market.loaders.lowlevel.bbg.loaderbbgopen import BBGLowLevelDaily, BBGLowLevelIntraday
+
+class AppendingEventLoop:
+    """
+    AppendingEventLoop - Adds each chunk to the DataFrame as it arrives (like the old event_loop)
+    """
+
+    def event_loop(self, session, eventQueue):
+        data_frame = pandas.DataFrame()
+
+        while True:
+            event = session.nextEvent()
+
+            if event.eventType() in [fakeblpapi.Event.PARTIAL_RESPONSE, fakeblpapi.Event.RESPONSE]:
+                for data_frame_slice in self.process_response_event(event):
+                    data_frame_slice = self.combine_slices([data_frame_slice])
+
+                    if data_frame.empty:
+                        data_frame = data_frame_slice
+                    else:
+                        data_frame = self.add_slice(data_frame, data_frame_slice)
+
+                if event.eventType() == fakeblpapi.Event.RESPONSE: break
+
+        self._data_frame = data_frame
+
+class AppendingIntraday(AppendingEventLoop, BBGLowLevelIntraday):
+    def add_slice(self, data_frame, data_frame_slice):
+        return pandas.concat([data_frame, data_frame_slice])
+
+class AppendingDaily(AppendingEventLoop, BBGLowLevelDaily):
+    def add_slice(self, data_frame, data_frame_slice):
+        return data_frame.join(data_frame_slice, how = "outer")
+
+def cached_responder(session, request):
+    # create the events for each request once, so we only time the loaders
+    key = str(request)
+
+    if key not in responses: responses[key] = create_events(session, request)
+
+    return responses[key]
+
+responses = {}
+create_events = fakeblpapi.Session.responder
+fakeblpapi.Session.responder = cached_responder
+
+def time_load(loader, time_series_request):
+    # first call creates the events
+    loader.load_time_series(time_series_request)
+
+    start = time.time()
+    data_frame = loader.load_time_series(time_series_request)
+
+    return data_frame, time.time() - start
+
+if __name__ == '__main__':
+    logger = LoggerManager().getLogger(__name__)
+
+    # don't log every chunk
+    LoggerManager().getLogger('pythalesians.market.loaders.lowlevel.bbg.loaderbbgopen').setLevel('WARNING')
+
+    fakeblpapi.Session.start_latency = 0
+
+    # 10 minute bars per chunk, so a month of bars comes back in over 4000 chunks
+    fakeblpapi.Session.chunk_size = 10
+
+    intraday_request = TimeSeriesRequest(start_date = datetime.datetime(2015, 1, 1),
+                                         finish_date = datetime.datetime(2015, 2, 1),
+                                         freq = 'intraday', freq_mult = 1, data_source = 'bloomberg',
+                                         trade_side = 'trade', tickers = ['EURUSD Curncy'], fields = ['close'])
+
+    # one chunk per ticker
+    daily_request = TimeSeriesRequest(start_date = datetime.datetime(2014, 1, 1),
+                                      finish_date = datetime.datetime(2015, 1, 1),
+                                      freq = 'daily', data_source = 'bloomberg',
+                                      tickers = ['TICKER' + str(i) + ' Curncy' for i in range(0, 1000)],
+                                      fields = ['PX_LAST'])
+
+    for name, old, new, time_series_request in [
+        ('intraday', AppendingIntraday(), BBGLowLevelIntraday(), intraday_request),
+        ('daily', AppendingDaily(), BBGLowLevelDaily(), daily_request)]:
+
+        data_frame_old, duration_old = time_load(old, time_series_request)
+        data_frame_new, duration_new = time_load(new, time_series_request)
+
+        # both should give the same answer
+        assert data_frame_old.sort_index(axis = 1).equals(data_frame_new.sort_index(axis = 1))
+
+        logger.info(name + " (" + str(data_frame_new.shape) + "): adding each chunk " + str(round(duration_old, 2))
+                    + " seconds, creating once " + str(round(duration_new, 2)) + " seconds")
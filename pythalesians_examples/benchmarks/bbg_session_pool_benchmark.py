@@ -0,0 +1,75 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+bbg_session_pool_benchmark
+
+Measures how long it takes to make many small Bloomberg daily requests (from several threads, as LightTimeSeriesFactory
+does), with a fresh session for each request versus sessions reused from BBGSessionPool. Uses fakeblpapi, where each
+session takes 50ms to start (so no Bloomberg connection is needed).
+
+"""
+
+import sys
+import time
+import datetime
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pythalesians_examples.benchmarks import fakeblpapi
+
+sys.modules['blpapi'] = fakeblpapi
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.market.requests.timeseriesrequest import TimeSeriesRequest
+from pythalesians.market.loaders.lowlevel.bbg.loaderbbgopen import BBGLowLevelDaily, BBGLowLevelTemplate
+
+def load_daily(i):
+    time_series_request = TimeSeriesRequest(start_date = datetime.datetime(2015, 1, 1),
+                                            finish_date = datetime.datetime(2015, 2, 1),
+                                            freq = 'daily', data_source = 'bloomberg',
+                                            tickers = ['TICKER' + str(i) + ' Curncy'], fields = ['PX_LAST'])
+
+    return BBGLowLevelDaily().load_time_series(time_series_request)
+
+def run_requests(request_no, thread_no, reuse):
+    # without reuse, idle sessions are always too old, so every request has to start a new one
+    BBGLowLevelDaily().get_session_pool().max_idle = 300 if reuse else -1
+
+    executor = ThreadPoolExecutor(max_workers = thread_no)
+
+    start = time.time()
+    list(executor.map(load_daily, range(0, request_no)))
+    duration = time.time() - start
+
+    executor.shutdown()
+
+    BBGLowLevelTemplate.close_session_pool()
+
+    return duration
+
+if __name__ == '__main__':
+    logger = LoggerManager().getLogger(__name__)
+
+    request_no = 200
+    thread_no = 8
+
+    for reuse in [False, True]:
+        started = fakeblpapi.Session.sessions_started
+
+        duration = run_requests(request_no, thread_no, reuse)
+
+        logger.info(("Pooled" if reuse else "New session per request") + ": " + str(request_no) + " requests in "
+                    + str(round(duration, 2)) + " seconds, "
+                    + str(fakeblpapi.Session.sessions_started - started) + " sessions started")
@@ -0,0 +1,127 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+dukascopy_decode_benchmark
+
+Compares the old row by row (struct.unpack) Dukascopy tick parser with the vectorised NumPy decoder in
+LoaderDukasCopy, on a synthetic full day of EURUSD ticks (no network access required).
+
+"""
+
+import datetime
+import struct
+import time
+
+from datetime import timedelta
+
+import numpy
+import pandas
+
+try:
+    import lzma
+except ImportError:
+    from backports import lzma
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.market.loaders.lowlevel.brokers.loaderdukascopy import LoaderDukasCopy
+
+def create_synthetic_bi5(ticks_per_hour, seed = 0):
+    """
+    create_synthetic_bi5 - Creates an LZMA compressed hour of ticks in the Dukascopy bi5 layout
+
+    Parameters
+    ----------
+    ticks_per_hour : int
+        number of ticks in the file
+    seed : int
+        random seed
+
+    Returns
+    -------
+    bytes
+    """
+    rs = numpy.random.RandomState(seed)
+
+    ticks = numpy.zeros(ticks_per_hour, dtype = LoaderDukasCopy.tick_dtype)
+
+    ticks['temp'] = numpy.sort(rs.randint(0, 3600 * 1000, ticks_per_hour))
+    ticks['bid'] = 110000 + numpy.cumsum(rs.randint(-2, 3, ticks_per_hour))
+    ticks['ask'] = ticks['bid'] + rs.randint(1, 4, ticks_per_hour)
+    ticks['bidv'] = rs.uniform(0.5, 5, ticks_per_hour)
+    ticks['askv'] = rs.uniform(0.5, 5, ticks_per_hour)
+
+    return lzma.compress(ticks.tobytes(), format = lzma.FORMAT_ALONE)
+
+def retrieve_df_struct(data, symbol, epoch):
+    """
+    retrieve_df_struct - Old implementation of LoaderDukasCopy.retrieve_df (struct.unpack per row), kept for comparison
+    """
+    chunks_list = [data[i:i + 20] for i in range(0, len(data), 20)]
+    parsed_list = []
+    date = []
+
+    for row in chunks_list:
+        d = struct.unpack(">LLLff", row)
+        date.append((epoch + timedelta(0,0,0, d[0])))
+        parsed_list.append(d)
+
+    df = pandas.DataFrame(data = parsed_list, columns=['temp', 'bid', 'ask', 'bidv', 'askv'], index = date)
+    df = df.drop('temp', axis = 1)
+    df.index.name = 'Date'
+
+    divisor = 100000
+
+    if symbol[3:6] == 'JPY':
+        divisor = 1000
+
+    df['bid'] =  df['bid'] /  divisor
+    df['ask'] =  df['ask'] / divisor
+
+    return df
+
+if __name__ == '__main__':
+    logger = LoggerManager().getLogger(__name__)
+
+    symbol = 'EURUSD'
+    ticks_per_hour = 10000
+    start = datetime.datetime(2016, 6, 1)
+
+    hours = [start + timedelta(hours = h) for h in range(0, 24)]
+    files = [create_synthetic_bi5(ticks_per_hour, seed = h) for h in range(0, 24)]
+
+    loader = LoaderDukasCopy()
+
+    # LZMA decompression costs the same for both parsers, so time it separately
+    t0 = time.time()
+    data = [lzma.decompress(f) for f in files]
+    t_lzma = time.time() - t0
+
+    t0 = time.time()
+    df_old = pandas.concat([retrieve_df_struct(d, symbol, h) for d, h in zip(data, hours)])
+    t_old = time.time() - t0
+
+    t0 = time.time()
+    df_new = pandas.concat([loader.retrieve_df(d, symbol, h) for d, h in zip(data, hours)])
+    t_new = time.time() - t0
+
+    # both parsers should give identical output
+    assert numpy.allclose(df_old.values, df_new[df_old.columns].values)
+    assert (df_old.index == df_new.index).all()
+
+    logger.info("Parsed " + str(len(df_new.index)) + " ticks (one day)")
+    logger.info("LZMA decompression: " + str(round(t_lzma, 3)) + " seconds")
+    logger.info("struct.unpack parser: " + str(round(t_old, 3)) + " seconds")
+    logger.info("NumPy record parser: " + str(round(t_new, 3)) + " seconds")
+    logger.info("Speed up: " + str(round(t_old / t_new, 1)) + "x")
@@ -0,0 +1,153 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+dukascopy_download_benchmark
+
+Measures the throughput of LoaderDukasCopy when downloading a year of hours, against a local HTTP server which
+serves synthetic bi5 files from disk (in the same layout as the Dukascopy datafeed), with different thread numbers.
+
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.market.requests.timeseriesrequest import TimeSeriesRequest
+from pythalesians.market.loaders.lowlevel.brokers.loaderdukascopy import LoaderDukasCopy
+from pythalesians_examples.benchmarks.dukascopy_decode_benchmark import create_synthetic_bi5
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def create_bi5_handler(root_folder, latency = 0):
+    """
+    create_bi5_handler - Creates an HTTP handler which serves files under root_folder (404 if missing), with an
+    artificial delay on each request to mimic the round trip to the real server
+    """
+
+    class Bi5Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # keep-alive
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if latency > 0: time.sleep(latency)
+
+            path = os.path.join(root_folder, self.path.lstrip('/'))
+
+            if not os.path.isfile(path):
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+                return
+
+            with open(path, 'rb') as f:
+                content = f.read()
+
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Bi5Handler
+
+def start_local_server(root_folder, latency = 0):
+    """
+    start_local_server - Starts an HTTP stand-in for the Dukascopy datafeed in a background thread
+
+    Returns
+    -------
+    HTTPServer, str (base URL)
+    """
+
+    server = ThreadedHTTPServer(('127.0.0.1', 0), create_bi5_handler(root_folder, latency))
+
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server, 'http://127.0.0.1:' + str(server.server_address[1]) + '/'
+
+def write_synthetic_archive(root_folder, symbol, time_list, ticks_per_hour):
+    loader = LoaderDukasCopy()
+
+    # same file for every hour is fine, we are only measuring download throughput
+    content = create_synthetic_bi5(ticks_per_hour)
+
+    for t in time_list:
+        # leave weekends out, as on the real server
+        if t.weekday() >= 5: continue
+
+        path = os.path.join(root_folder, loader.get_tick_path(t, symbol))
+
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'wb') as f:
+            f.write(content)
+
+if __name__ == '__main__':
+    logger = LoggerManager().getLogger(__name__)
+
+    symbol = 'EURUSD'
+    start_date = datetime.datetime(2015, 1, 1)
+    finish_date = datetime.datetime(2016, 1, 1)
+
+    root_folder = tempfile.mkdtemp()
+
+    try:
+        time_list = list(LoaderDukasCopy().hour_range(start_date, finish_date))
+
+        logger.info("Writing " + str(len(time_list)) + " synthetic hours to " + root_folder)
+        write_synthetic_archive(root_folder, symbol, time_list, 100)
+
+        # 20ms per request, roughly what we see from a fast connection to Dukascopy
+        server, base_url = start_local_server(root_folder, latency = 0.02)
+
+        time_series_request = TimeSeriesRequest(start_date = start_date, finish_date = finish_date,
+                                                freq = 'tick', data_source = 'dukascopy',
+                                                tickers = [symbol], vendor_tickers = [symbol],
+                                                fields = ['bid', 'ask'], vendor_fields = ['bid', 'ask'])
+
+        for thread_no in [1, 4, 8, 16]:
+            loader = LoaderDukasCopy()
+            loader.base_url = base_url
+            loader.thread_no = thread_no
+            loader.host_connection_limit = thread_no
+
+            start = time.time()
+            df = loader.download_tick(time_series_request)
+            duration = time.time() - start
+
+            logger.info("With " + str(thread_no) + " threads: " + str(round(duration, 2)) + " seconds, "
+                        + str(round(len(time_list) / duration, 1)) + " hours/second, " + str(len(df.index)) + " ticks")
+
+        server.shutdown()
+    finally:
+        shutil.rmtree(root_folder, ignore_errors = True)
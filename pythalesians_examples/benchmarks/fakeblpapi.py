@@ -0,0 +1,258 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+fakeblpapi
+
+A stand in for the parts of the Bloomberg Open API (blpapi) used by LoaderBBGOpen, so that the Bloomberg loaders can
+be benchmarked without a Bloomberg connection. Sessions take start_latency seconds to start, and answer requests with
+the events created by Session.responder (by default synthetic HistoricalDataRequest, IntradayBarRequest and
+IntradayTickRequest responses, split into chunks of chunk_size points).
+
+To use, install before importing LoaderBBGOpen:
+
+    import sys
+    from pythalesians_examples.benchmarks import fakeblpapi
+    sys.modules['blpapi'] = fakeblpapi
+
+"""
+
+import collections
+import threading
+import time
+
+import numpy
+import pandas
+
+class Name(str):
+    pass
+
+class SessionOptions:
+    def setServerHost(self, host): self.host = host
+    def setServerPort(self, port): self.port = port
+
+class Element:
+    """
+    Element - Node in a message, holding either a dict of named sub elements, a list of values (array) or a value
+    """
+
+    def __init__(self, name, value):
+        self._name = Name(name)
+
+        if isinstance(value, dict):
+            self._elements = collections.OrderedDict((k, v if isinstance(v, Element) else Element(k, v))
+                                                     for k, v in value.items())
+            self._values = None
+        elif isinstance(value, list):
+            self._elements = None
+            self._values = [v if isinstance(v, Element) or not isinstance(v, dict) else Element(name, v)
+                            for v in value]
+        else:
+            self._elements = None
+            self._values = [value]
+
+    def name(self): return self._name
+    def isValid(self): return True
+    def isArray(self): return self._elements is None and len(self._values) != 1
+    def hasElement(self, name): return self._elements is not None and name in self._elements
+    def numElements(self): return len(self._elements)
+    def elements(self): return list(self._elements.values())
+    def numValues(self): return len(self._values) if self._values is not None else 1
+    def values(self): return self._values
+
+    def getElement(self, name):
+        if isinstance(name, int): return list(self._elements.values())[name]
+
+        return self._elements[name]
+
+    def getValue(self, i = 0):
+        if self._values is None: return self
+
+        return self._values[i]
+
+    def getElementAsFloat(self, name): return float(self.getElement(name).getValue())
+    def getElementAsInteger(self, name): return int(self.getElement(name).getValue())
+    def getElementAsDatetime(self, name): return self.getElement(name).getValue()
+    def getElementAsString(self, name): return str(self.getElement(name).getValue())
+
+class Message(Element):
+    def __init__(self, message_type, value):
+        Element.__init__(self, message_type, value)
+
+    def messageType(self): return self.name()
+
+class Event:
+    # same values as blpapi
+    ADMIN, SESSION_STATUS, SUBSCRIPTION_STATUS, REQUEST_STATUS, RESPONSE, PARTIAL_RESPONSE = 1, 2, 3, 4, 5, 6
+    SERVICE_STATUS, TIMEOUT = 9, 10
+
+    def __init__(self, event_type, messages):
+        self._event_type = event_type
+        self._messages = messages
+
+    def eventType(self): return self._event_type
+
+    def __iter__(self): return iter(self._messages)
+
+class Request:
+    def __init__(self, request_type):
+        self.request_type = request_type
+        self.elements = collections.defaultdict(list)
+        self.settings = {}
+
+    def set(self, name, value): self.settings[name] = value
+    def append(self, name, value): self.settings[name] = value
+
+    def getElement(self, name):
+        request = self
+
+        class ArrayElement:
+            def appendValue(self, value): request.elements[name].append(value)
+
+            def appendElement(self):
+                element = {}
+                request.elements[name].append(element)
+
+                class Override:
+                    def setElement(self, key, value): element[key] = value
+
+                return Override()
+
+        return ArrayElement()
+
+    def __str__(self):
+        return self.request_type + " " + str(dict(self.elements)) + " " + str(self.settings)
+
+class Service:
+    def createRequest(self, request_type): return Request(request_type)
+
+class Session:
+    start_latency = 0.05     # seconds to start a session and open a service
+    request_latency = 0.0    # seconds before the first response to a request
+    chunk_size = 100         # points per PARTIAL_RESPONSE event
+    sessions_started = 0
+
+    _lock = threading.Lock()
+
+    def __init__(self, options):
+        self._queue = collections.deque()
+        self._services = set()
+        self._started = False
+
+    def start(self):
+        time.sleep(self.start_latency)
+
+        with Session._lock: Session.sessions_started = Session.sessions_started + 1
+
+        self._started = True
+
+        return True
+
+    def stop(self):
+        self._started = False
+
+        return True
+
+    def openService(self, name):
+        self._services.add(name)
+
+        return self._started
+
+    def getService(self, name):
+        if name not in self._services: raise Exception("Service not opened: " + name)
+
+        return Service()
+
+    def sendRequest(self, request, *args):
+        time.sleep(self.request_latency)
+
+        self._queue.extend(self.responder(request))
+
+    def nextEvent(self, timeout = 0):
+        if len(self._queue) == 0: return Event(Event.TIMEOUT, [])
+
+        return self._queue.popleft()
+
+    def tryNextEvent(self):
+        if len(self._queue) == 0: return None
+
+        return self._queue.popleft()
+
+    def responder(self, request):
+        if request.request_type == 'HistoricalDataRequest': return create_daily_events(request, self.chunk_size)
+        if request.request_type == 'IntradayBarRequest': return create_intraday_events(request, self.chunk_size)
+        if request.request_type == 'IntradayTickRequest': return create_tick_events(request, self.chunk_size)
+
+        return [Event(Event.RESPONSE, [])]
+
+def split_events(messages):
+    # every event apart from the last is partial
+    return [Event(Event.PARTIAL_RESPONSE, [m]) for m in messages[:-1]] + [Event(Event.RESPONSE, messages[-1:])]
+
+def create_daily_events(request, chunk_size):
+    """
+    create_daily_events - Creates a HistoricalDataRequest response, one message per security (as from Bloomberg)
+    """
+
+    dates = pandas.bdate_range(request.settings['startDate'], request.settings['endDate'])
+    fields = request.elements['fields']
+
+    messages = []
+
+    for security in request.elements['securities']:
+        values = numpy.random.RandomState(len(security)).randn(len(dates), len(fields))
+
+        field_data = [collections.OrderedDict([('date', dates[i].to_pydatetime())]
+                                              + [(fields[j], values[i, j]) for j in range(0, len(fields))])
+                      for i in range(0, len(dates))]
+
+        messages.append(Message('HistoricalDataResponse',
+                                {'securityData' : {'security' : security, 'fieldData' : field_data}}))
+
+    return split_events(messages)
+
+def create_intraday_events(request, chunk_size):
+    """
+    create_intraday_events - Creates an IntradayBarRequest response, in chunks of chunk_size bars
+    """
+
+    index = pandas.date_range(request.settings['startDateTime'], request.settings['endDateTime'],
+                              freq = str(request.settings['interval']) + 'min')
+
+    values = numpy.random.RandomState(0).randn(len(index), 4) + 100
+
+    bars = [{'time' : index[i].to_pydatetime(), 'open' : values[i, 0], 'high' : values[i, 1], 'low' : values[i, 2],
+             'close' : values[i, 3], 'volume' : i, 'numEvents' : 1} for i in range(0, len(index))]
+
+    messages = [Message('IntradayBarResponse', {'barData' : {'barTickData' : Element('barTickData', bars[i:i + chunk_size])}})
+                for i in range(0, max(len(bars), 1), chunk_size)]
+
+    return split_events(messages)
+
+def create_tick_events(request, chunk_size):
+    """
+    create_tick_events - Creates an IntradayTickRequest response, in chunks of chunk_size ticks
+    """
+
+    index = pandas.date_range(request.settings['startDateTime'], request.settings['endDateTime'], freq = 's')
+
+    values = numpy.random.RandomState(0).randn(len(index)) + 100
+
+    ticks = [{'time' : index[i].to_pydatetime(), 'type' : 'TRADE', 'value' : values[i], 'size' : 1}
+             for i in range(0, len(index))]
+
+    messages = [Message('IntradayTickResponse', {'tickData' : {'tickData' : Element('tickData', ticks[i:i + chunk_size])}})
+                for i in range(0, max(len(ticks), 1), chunk_size)]
+
+    return split_events(messages)
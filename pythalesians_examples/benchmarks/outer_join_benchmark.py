@@ -0,0 +1,89 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+outer_join_benchmark
+
+Compares the time and peak memory of the outer joins in TimeSeriesCalcs (outer_join, pandas_outer_join,
+functional_outer_join and iterative_outer_join) when aggregating 10, 100 and 1000 per ticker intraday time series,
+each with gaps in different places (as we get from LightTimeSeriesFactory).
+
+"""
+
+import time
+import tracemalloc
+
+import numpy
+import pandas
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.timeseries.calcs.timeseriescalcs import TimeSeriesCalcs
+
+def create_ticker_frames(ticker_no, minutes = 5 * 1440, seed = 0):
+    """
+    create_ticker_frames - Creates float32 minute time series for many tickers, each missing a random 20% of minutes
+    """
+
+    rs = numpy.random.RandomState(seed)
+
+    index = pandas.date_range('2016-01-04', periods = minutes, freq = 'min')
+
+    df_list = []
+
+    for i in range(0, ticker_no):
+        keep = rs.uniform(size = minutes) > 0.2
+
+        df_list.append(pandas.DataFrame(rs.randn(keep.sum(), 2).astype(numpy.float32), index = index[keep],
+                                        columns = ['T' + str(i) + '.bid', 'T' + str(i) + '.ask']))
+
+    return df_list
+
+def time_join(join, df_list):
+    tracemalloc.start()
+
+    start = time.time()
+    data_frame = join(df_list)
+    duration = time.time() - start
+
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return data_frame, duration, peak
+
+if __name__ == '__main__':
+    logger = LoggerManager().getLogger(__name__)
+
+    tsc = TimeSeriesCalcs()
+
+    joins = [('outer_join', tsc.outer_join),
+             ('pandas_outer_join', tsc.pandas_outer_join),
+             ('functional_outer_join', tsc.functional_outer_join),
+             ('iterative_outer_join', tsc.iterative_outer_join)]
+
+    for ticker_no in [10, 100, 1000]:
+        df_list = create_ticker_frames(ticker_no)
+
+        expected = None
+
+        for name, join in joins:
+            data_frame, duration, peak = time_join(join, df_list)
+
+            # all the joins should give the same answer (up to float32/float64)
+            if expected is None:
+                expected = data_frame
+            else:
+                assert numpy.allclose(expected.values, data_frame.values, equal_nan = True)
+
+            logger.info(str(ticker_no) + " frames, " + name + ": " + str(round(duration, 3)) + " seconds, peak "
+                        + str(round(peak / (1024.0 * 1024.0), 1)) + " MB")
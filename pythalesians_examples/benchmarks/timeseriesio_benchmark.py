@@ -0,0 +1,116 @@
+__author__ = 'saeedamen' # Saeed Amen / saeed@thalesians.com
+
+#
+# Copyright 2015 Thalesians Ltd. - http//www.thalesians.com / @thalesians
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#
+# See the License for the specific language governing permissions and limitations under the License.
+#
+
+"""
+timeseriesio_benchmark
+
+Compares the TimeSeriesIO backends (HDF5, HDF5 table format, bcolz, Parquet and memory mapped float32) on the same
+synthetic intraday data: write and read throughput, size on disk, and time to read one week of one column. Backends
+whose libraries aren't installed are skipped.
+
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy
+import pandas
+
+from pythalesians.util.loggermanager import LoggerManager
+from pythalesians.market.loaders.timeseriesio import TimeSeriesIO
+
+def create_intraday_data(ticker_no = 10, minutes = 2 * 365 * 1440, seed = 0):
+    """
+    create_intraday_data - Creates float32 minute bid/ask time series for several tickers (as cached by
+    LightTimeSeriesFactory)
+    """
+
+    rs = numpy.random.RandomState(seed)
+
+    index = pandas.date_range('2014-01-01', periods = minutes, freq = 'min', tz = 'UTC', name = 'Date')
+
+    columns = [t + '.' + f for t in ['TICKER' + str(i) for i in range(0, ticker_no)] for f in ['bid', 'ask']]
+
+    data = (100 + numpy.cumsum(rs.randn(minutes, len(columns)), axis = 0) * 0.01).astype(numpy.float32)
+
+    return pandas.DataFrame(data, index = index, columns = columns)
+
+def get_disk_size(path):
+    if os.path.isfile(path): return os.path.getsize(path)
+
+    size = 0
+
+    for root, dirs, files in os.walk(path):
+        for f in files: size = size + os.path.getsize(os.path.join(root, f))
+
+    return size
+
+if __name__ == '__main__':
+    logger = LoggerManager().getLogger(__name__)
+
+    tsio = TimeSeriesIO()
+
+    data_frame = create_intraday_data()
+    data_mb = data_frame.memory_usage(index = True).sum() / (1024.0 * 1024.0)
+
+    logger.info("Data: " + str(data_frame.shape) + ", " + str(round(data_mb, 1)) + " MB in memory")
+
+    folder = tempfile.mkdtemp()
+
+    backends = [('hdf5', {}, tsio.get_h5_filename),
+                ('hdf5 table', {'use_table' : True}, tsio.get_h5_filename),
+                ('bcolz', {'use_bcolz' : True}, tsio.get_bcolz_filename),
+                ('parquet', {'use_parquet' : True}, tsio.get_parquet_filename),
+                ('mmap', {'use_mmap' : True}, tsio.get_mmap_filename)]
+
+    week_start = pandas.Timestamp('2015-03-02', tz = 'UTC')
+    week_finish = pandas.Timestamp('2015-03-08 23:59', tz = 'UTC')
+
+    for name, options, get_filename in backends:
+        fname = os.path.join(folder, 'fx_intraday_' + name.replace(' ', '_'))
+
+        try:
+            start = time.time()
+            tsio.write_time_series_cache_to_disk(fname, data_frame.copy(), **options)
+            write_duration = time.time() - start
+        except Exception as e:
+            logger.info(name + ": skipped (" + str(e) + ")")
+            continue
+
+        read_options = dict((k, v) for k, v in options.items() if k != 'use_table')
+
+        start = time.time()
+        tsio.read_time_series_cache_from_disk(fname, **read_options)
+        read_duration = time.time() - start
+
+        # date range/column reads (bcolz and fixed HDF5 read everything and then slice)
+        start = time.time()
+
+        if name == 'bcolz':
+            tsio.read_time_series_cache_from_disk(fname, **read_options).loc[week_start:week_finish, ['TICKER3.bid']]
+        else:
+            tsio.read_time_series_cache_from_disk(fname, start_date = week_start, finish_date = week_finish,
+                                                  columns = ['TICKER3.bid'], **read_options)
+
+        week_duration = time.time() - start
+
+        disk_mb = get_disk_size(get_filename(fname)) / (1024.0 * 1024.0)
+
+        logger.info(name + ": write " + str(round(data_mb / write_duration, 1)) + " MB/s, read "
+                    + str(round(data_mb / read_duration, 1)) + " MB/s, one week of one column "
+                    + str(round(week_duration * 1000, 1)) + " ms, " + str(round(disk_mb, 1)) + " MB on disk")
+
+    shutil.rmtree(folder, ignore_errors = True)
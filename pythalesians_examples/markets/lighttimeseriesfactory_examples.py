@@ -65,6 +65,32 @@ if True:
         pf = PlotFactory()
         pf.plot_line_graph(df, adapter = 'pythalesians')
 
+    ###### load daily data from Bloomberg via the cache, then ask for an extra field (only that is downloaded again,
+    ###### as the cache keeps track of the dates held for each ticker.field)
+    if False:
+        ltsf = LightTimeSeriesFactory()
+
+        time_series_request = TimeSeriesRequest(
+                start_date = "01 Jan 2010",                     # start date
+                finish_date = "31 Dec 2012",                    # finish date
+                freq = 'daily',                                 # daily data
+                data_source = 'bloomberg',                      # use Bloomberg as data source
+                tickers = ['EURUSD'],                           # ticker (Thalesians)
+                fields = ['close'],                             # which fields to download
+                vendor_tickers = ['EURUSD BGN Curncy'],         # ticker (Bloomberg)
+                vendor_fields = ['PX_LAST'],                    # which Bloomberg fields to download
+                cache_algo = 'cache_algo_return')               # how to return data
+
+        df = ltsf.harvest_time_series(time_series_request)
+
+        # close is already in the cache for these dates, but open isn't, so both are downloaded
+        time_series_request.fields = ['close', 'open']
+        time_series_request.vendor_fields = ['PX_LAST', 'PX_OPEN']
+
+        df = ltsf.harvest_time_series(time_series_request)
+
+        print(df[['EURUSD.close', 'EURUSD.open']].tail())
+
     ###### download event dates for non farm payrolls and then print
     if False:
 
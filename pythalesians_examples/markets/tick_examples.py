@@ -172,3 +172,23 @@ if True:
 
         pf.plot_line_graph(df, adapter = 'pythalesians', gp = gp)
 
+
+    ###### download tick data from Dukascopy for EUR/USD, aggregating into minute bars as each hour arrives
+    if False:
+        time_series_request = TimeSeriesRequest(
+                    start_date = "01 Jun 2015",                     # start date
+                    finish_date = "01 Jul 2015",                    # finish date
+                    freq = 'tick',                                  # tick data
+                    bar_freq = '1min',                              # aggregated into 1 minute bars
+                    data_source = 'dukascopy',                      # use Dukascopy as data source
+                    tickers = ['EURUSD'],                           # ticker (Thalesians)
+                    fields = ['close', 'spread', 'tickcount'],      # which bar fields to return
+                    vendor_tickers = ['EURUSD'],                    # ticker (Dukascopy)
+                    cache_algo = 'internet_load_return')            # how to return data
+
+        ltsf = LightTimeSeriesFactory()
+
+        df = ltsf.harvest_time_series(time_series_request)
+
+        pf = PlotFactory()
+        pf.plot_line_graph(df[['EURUSD.close']], adapter = 'pythalesians')